@@ -0,0 +1,187 @@
+"""
+Solver benchmarks, no pygame needed:
+
+    python -m benchmark run --output baseline.json
+    python -m benchmark run --collection levels.xsb --output current.json
+    python -m benchmark compare baseline.json current.json --threshold 0.1
+
+run solves the levels bundled with the game (SokobanGame._load_examples)
+and optionally an XSB collection with every strategy, recording nodes
+expanded, nodes per second, wall time and peak memory. compare reports the
+cases that got slower, expanded more nodes, used more memory or lost their
+solution, and exits with status 1 if there are any.
+"""
+import argparse
+import ast
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from limits import Limits, peak_memory
+from search import Search
+from sokoban import SokobanPuzzle
+from xsb import read_levels
+
+DEFAULT_ALGOS = ("bfs", "external", "bidirectional", "astar:h1", "astar:h2", "astar:h3",
+                 "astar:hm", "astar:hp", "anytime:hm", "ida:h2")
+FORMAT_VERSION = 1
+
+
+def bundled_levels():
+    #The levels of SokobanGame._load_examples, read from main.py's source
+    #so that pygame is not imported
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if isinstance(node, ast.FunctionDef) and node.name == "_load_examples":
+            for statement in node.body:
+                if isinstance(statement, ast.Return):
+                    return ast.literal_eval(statement.value)
+    raise ValueError("no _load_examples in main.py")
+
+
+def benchmark_levels(collection=None):
+    """(name, grid) of the bundled levels, then of the collection's levels."""
+    levels = [("bundled:%d" % i, grid) for i, grid in enumerate(bundled_levels())]
+    if collection:
+        prefix = os.path.basename(collection)
+        levels += [("%s:%d" % (prefix, i), grid) for i, (_, grid) in enumerate(read_levels(collection))]
+    return levels
+
+
+def run_case(task):
+    """Solve one (level name, grid, algo, push_moves, limits, repeat) case; returns its record.
+
+    Runs in a fresh worker process, so peak_rss_kb is the peak of this case.
+    """
+    name, grid, algo, push_moves, limits, repeat = task
+    record = {"level": name, "algo": algo, "push_moves": push_moves}
+    times = []
+    for _ in range(repeat):
+        search = Search(limits=limits)
+        state = SokobanPuzzle(grid)
+        start = time.perf_counter()
+        node = search.solve(state, algo, push_moves)
+        times.append(time.perf_counter() - start)
+    seconds = min(times)
+    record["status"] = search.result.status if search.result is not None else None
+    record["cost"] = node.g if node is not None else None
+    record["expanded"] = search.expanded
+    record["generated"] = search.generated
+    record["seconds"] = round(seconds, 6)
+    record["nodes_per_sec"] = round(search.expanded / seconds) if seconds > 0 else None
+    peak = peak_memory()
+    if peak is not None:
+        record["peak_rss_kb"] = peak // 1024
+    return record
+
+
+def run(args):
+    limits = Limits(args.max_nodes, args.time_limit, args.max_memory)
+    algos = args.algos.split(",") if args.algos else DEFAULT_ALGOS
+    tasks = [(name, grid, algo, args.push_moves, limits, args.repeat)
+             for name, grid in benchmark_levels(args.collection) for algo in algos]
+    results = []
+    # one case per worker process; a single worker by default, so cases do
+    # not compete for the CPU and the timings stay comparable
+    with multiprocessing.Pool(args.jobs, maxtasksperchild=1) as pool:
+        for record in pool.imap(run_case, tasks):
+            results.append(record)
+            print("%-16s %-14s %-10s %10s expanded %10.4fs %10s nodes/s" % (
+                record["level"], record["algo"], record["status"], record["expanded"],
+                record["seconds"], record["nodes_per_sec"]), file=sys.stderr)
+    baseline = {
+        "version": FORMAT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(baseline, f, indent=1)
+    else:
+        json.dump(baseline, sys.stdout, indent=1)
+        sys.stdout.write("\n")
+
+
+def regressions(baseline, current, threshold=0.1, min_seconds=0.005):
+    """Messages for the cases of current that are worse than in baseline.
+
+    Time, expanded nodes and peak memory regress when they grow by more
+    than threshold (a fraction); times under min_seconds in both runs are
+    too noisy to compare. A lost solution or a higher cost always regresses.
+    Cases missing from either run are skipped.
+    """
+    def key(record):
+        return record["level"], record["algo"], record["push_moves"]
+
+    before = {key(record): record for record in baseline["results"]}
+    messages = []
+    for record in current["results"]:
+        old = before.get(key(record))
+        if old is None:
+            continue
+        case = "%s %s%s" % (record["level"], record["algo"], " (pushes)" if record["push_moves"] else "")
+        if old["status"] == "solved" and record["status"] != "solved":
+            messages.append("%s: %s, was solved" % (case, record["status"]))
+            continue
+        if old["cost"] is not None and record["cost"] is not None and record["cost"] > old["cost"]:
+            messages.append("%s: cost %d, was %d" % (case, record["cost"], old["cost"]))
+        if max(old["seconds"], record["seconds"]) >= min_seconds:
+            if record["seconds"] > old["seconds"] * (1 + threshold):
+                messages.append("%s: %.4fs, was %.4fs" % (case, record["seconds"], old["seconds"]))
+        for counter in ("expanded", "peak_rss_kb"):
+            if old.get(counter) and record.get(counter) and record[counter] > old[counter] * (1 + threshold):
+                messages.append("%s: %s %d, was %d" % (case, counter, record[counter], old[counter]))
+    return messages
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    messages = regressions(baseline, current, args.threshold, args.min_seconds)
+    for message in messages:
+        print(message)
+    print("%d regression(s) in %d cases" % (len(messages), len(current["results"])))
+    return 1 if messages else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmark", description="Sokoban solver benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="benchmark every strategy and write a JSON baseline")
+    run_parser.add_argument("--collection", help="XSB (.sok) collection to run after the bundled levels")
+    run_parser.add_argument("--algos", help="comma-separated strategies (default: %s)" % ",".join(DEFAULT_ALGOS))
+    run_parser.add_argument("--push-moves", action="store_true",
+                            help="search over box pushes instead of steps")
+    run_parser.add_argument("--repeat", type=int, default=3, help="runs per case, the fastest counts (default: 3)")
+    run_parser.add_argument("--jobs", type=int, default=1, help="worker processes (default: 1)")
+    run_parser.add_argument("--max-nodes", type=int, help="give up a case after this many expansions")
+    run_parser.add_argument("--time-limit", type=float, default=60,
+                            help="give up a case after this many seconds (default: 60)")
+    run_parser.add_argument("--max-memory", type=int, help="give up a case above this many bytes of memory")
+    run_parser.add_argument("--output", help="write the baseline to this file instead of stdout")
+    run_parser.set_defaults(run=run)
+
+    compare_parser = commands.add_parser("compare", help="flag regressions of a run against a baseline")
+    compare_parser.add_argument("baseline", help="baseline JSON written by run")
+    compare_parser.add_argument("current", help="JSON of the run to check")
+    compare_parser.add_argument("--threshold", type=float, default=0.1,
+                                help="relative growth counted as a regression (default: 0.1)")
+    compare_parser.add_argument("--min-seconds", type=float, default=0.005,
+                                help="ignore timings below this many seconds (default: 0.005)")
+    compare_parser.set_defaults(run=compare)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+from sokoban import SokobanPuzzle
+
+
+class DeadlockDetector:
+    """
+    Base class of the dynamic deadlock detectors.
+    A detector looks at a freshly generated state around the box that was
+    just pushed and answers whether the state can no longer be solved.
+    Detectors must be sound: they may miss deadlocks but never prune a
+    solvable state. Each one counts how often it ran and how often it pruned.
+    """
+    name = "deadlock"
+
+    def __init__(self):
+        self.checks = 0
+        self.prunes = 0
+
+    def check(self, state, box):
+        """Run the detector and update its counters."""
+        self.checks += 1
+        if self.detect(state, box):
+            self.prunes += 1
+            return True
+        return False
+
+    def detect(self, state, box):
+        raise NotImplementedError
+
+    def reset(self):
+        self.checks = 0
+        self.prunes = 0
+
+
+class FreezeDeadlock(DeadlockDetector):
+    """
+    Frozen boxes: a box is blocked along an axis when a wall is on either
+    side, when both sides are dead squares, or when a neighbouring box on
+    that axis is itself frozen. A box blocked along both axes can never move
+    again; if the frozen group holds a box off storage the state is lost.
+    Boxes already being examined are treated as walls to stop the recursion.
+    """
+    name = "freeze"
+
+    # (first, second) direction indexes of each axis, see Level.ACTIONS
+    AXES = ((0, 1), (2, 3))
+
+    def detect(self, state, box):
+        frozen = set()
+        if not self._frozen(state.level, set(state.boxes), box, set(), frozen):
+            return False
+        target_mask = state.level.target_mask
+        for frozen_box in frozen:
+            if not target_mask[frozen_box]:
+                return True
+        return False
+
+    def _frozen(self, level, boxes, box, seen, frozen):
+        seen.add(box)
+        for axis in self.AXES:
+            if not self._blocked(level, boxes, box, axis, seen, frozen):
+                return False
+        frozen.add(box)
+        return True
+
+    def _blocked(self, level, boxes, box, axis, seen, frozen):
+        first = level.neighbours[box][axis[0]]
+        second = level.neighbours[box][axis[1]]
+        if first < 0 or second < 0 or first in seen or second in seen:
+            return True
+        if level.dead_mask[first] and level.dead_mask[second]:
+            return True
+        for cell in (first, second):
+            if cell in boxes and self._frozen(level, boxes, cell, seen, frozen):
+                return True
+        return False
+
+
+class BlockDeadlock(DeadlockDetector):
+    """
+    2x2 blocks: four cells that are all walls or boxes can never be broken
+    up, so the state is lost if one of the boxes in the block is off storage.
+    """
+    name = "block"
+
+    # (row, col) offsets of the top-left corner of the four 2x2 squares
+    # that contain the pushed box
+    CORNERS = ((0, 0), (0, -1), (-1, 0), (-1, -1))
+
+    def detect(self, state, box):
+        level = state.level
+        boxes = set(state.boxes)
+        row, col = level.position(box)
+        for d_row, d_col in self.CORNERS:
+            top, left = row + d_row, col + d_col
+            cells = [(top, left), (top, left + 1), (top + 1, left), (top + 1, left + 1)]
+            off_target = False
+            blocked = True
+            for cell_row, cell_col in cells:
+                if not level.in_bounds(cell_row, cell_col):
+                    continue  # off the grid counts as wall
+                cell = cell_row * level.width + cell_col
+                if cell in boxes:
+                    if not level.target_mask[cell]:
+                        off_target = True
+                elif not level.wall_mask[cell]:
+                    blocked = False
+                    break
+            if blocked and off_target:
+                return True
+        return False
+
+
+class CorralDeadlock(DeadlockDetector):
+    """
+    Corrals: after a push, the floor the player cannot reach splits into
+    closed areas. For the area next to the pushed box, the boxes inside or
+    on its border are solved alone (every other box removed) with a small
+    bounded push search. Removing boxes only makes a level easier, so if
+    that sub-problem has no solution the full state has none either. When
+    the search budget runs out the state is kept.
+    """
+    name = "corral"
+
+    def __init__(self, max_boxes=4, max_nodes=500):
+        super().__init__()
+        self.max_boxes = max_boxes
+        self.max_nodes = max_nodes
+
+    def detect(self, state, box):
+        level = state.level
+        neighbours = level.neighbours
+        boxes = set(state.boxes)
+        reachable = level.flood_fill(state.player, boxes)
+
+        # the corral next to the pushed box, if there is one
+        corral = None
+        for cell in neighbours[box]:
+            if cell >= 0 and cell not in reachable and cell not in boxes:
+                corral = level.flood_fill(cell, boxes)
+                break
+        if corral is None:
+            return False
+
+        corral_boxes = set()
+        for cell in corral:
+            for next_cell in neighbours[cell]:
+                if next_cell in boxes:
+                    corral_boxes.add(next_cell)
+        if len(corral_boxes) > self.max_boxes:
+            return False
+        if all(level.target_mask[corral_box] for corral_box in corral_boxes):
+            return False
+
+        sub_state = SokobanPuzzle.from_positions(level, state.player, tuple(sorted(corral_boxes)))
+        return not self._solvable(sub_state)
+
+    def _solvable(self, state):
+        #Bounded depth-first push search; True when solved or out of budget
+        stack = [state]
+        seen = {state}
+        while stack:
+            if len(seen) > self.max_nodes:
+                return True
+            current = stack.pop()
+            if current.isGoal():
+                return True
+            for _, successor in current.pushSuccessorFunction():
+                if successor not in seen:
+                    seen.add(successor)
+                    stack.append(successor)
+        return False
+
+
+class DeadlockPipeline:
+    """
+    Ordered list of detectors run on every generated push. Cheap detectors
+    go first; the first one that prunes stops the pipeline.
+    The default pipeline only holds the local 2x2 and freeze checks; the
+    corral check prunes more but its sub-search costs more than it saves
+    on small levels, so it is added with DeadlockPipeline.full().
+    """
+    def __init__(self, detectors=None):
+        if detectors is None:
+            detectors = [BlockDeadlock(), FreezeDeadlock()]
+        self.detectors = list(detectors)
+
+    @classmethod
+    def full(cls):
+        return cls([BlockDeadlock(), FreezeDeadlock(), CorralDeadlock()])
+
+    def is_deadlocked(self, state, box):
+        """True if one of the detectors proves state (after pushing box) lost."""
+        for detector in self.detectors:
+            if detector.check(state, box):
+                return True
+        return False
+
+    def stats(self):
+        """Per-detector {name: {"checks": n, "prunes": n}}."""
+        return {detector.name: {"checks": detector.checks, "prunes": detector.prunes}
+                for detector in self.detectors}
+
+    def reset(self):
+        for detector in self.detectors:
+            detector.reset()
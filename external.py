@@ -0,0 +1,187 @@
+import heapq
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from node import NodeTable
+from sokoban import SokobanPuzzle
+
+
+class SortedRun:
+    """
+    Read-only file of fixed-size records sorted by their leading 64-bit
+    key, memory-mapped so the operating system pages it in and out. Keys
+    are stored big-endian, which makes the byte order of whole records
+    the same as the numeric order of their keys.
+    """
+    KEY = struct.Struct('>Q')
+
+    def __init__(self, path, record_size):
+        self.path = path
+        self.record_size = record_size
+        self.count = os.path.getsize(path) // record_size
+        self.file = open(path, 'rb')
+        # an empty file cannot be mapped
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.count else None
+
+    @classmethod
+    def write(cls, path, records, record_size):
+        #Write already sorted records to path and map the result
+        with open(path, 'wb') as f:
+            for record in records:
+                f.write(record)
+        return cls(path, record_size)
+
+    def __len__(self):
+        return self.count
+
+    def key(self, i):
+        return self.KEY.unpack_from(self.map, i * self.record_size)[0]
+
+    def record(self, i):
+        return self.map[i * self.record_size:(i + 1) * self.record_size]
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.record(i)
+
+    def lower_bound(self, key, low=0):
+        #Position of the first record from low on whose key is not below key
+        high = self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def find(self, key):
+        #Record with this key, or None
+        i = self.lower_bound(key)
+        if i < self.count and self.key(i) == key:
+            return self.record(i)
+        return None
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        self.file.close()
+        os.remove(self.path)
+
+
+class ExternalBFS:
+    """
+    Breadth-first search that keeps its frontier and closed set on disk,
+    for levels whose state space does not fit in memory.
+
+    Each BFS layer is a SortedRun of (key, parent key, action code, player,
+    boxes) records. Successors are buffered in memory up to memory_limit
+    bytes, then sorted and spilled to a run; at the end of the layer the
+    runs are merged, and duplicates are removed in one sequential pass
+    against every earlier layer (delayed duplicate detection) instead of
+    one lookup per successor. The solution path is rebuilt backwards
+    through the layers by binary search on the parent keys.
+
+    States are identified by their 64-bit Zobrist key alone here: records
+    on disk do not keep enough to compare positions cheaply, and a
+    collision between two reachable states is very unlikely.
+    """
+    # per buffered record: bytes object header and list slot
+    RECORD_OVERHEAD = 41
+
+    def __init__(self, search, memory_limit=64 << 20, directory=None):
+        self.search = search
+        self.memory_limit = memory_limit
+        self.directory = directory
+        self.spills = 0  # runs written during the last solve
+
+    def solve(self, initial_state, push_moves=False):
+        """Solution node of the fewest steps (or pushes), or None.
+
+        Meant to be called through Search.external_BFS, which resets the
+        search counters and handles the limits.
+        """
+        search = self.search
+        self.spills = 0
+        if search.is_deadlocked(initial_state):
+            return None
+        nodes = NodeTable(initial_state, push_moves)
+        if initial_state.isGoal():
+            return nodes.node(nodes.add(initial_state), initial_state)
+
+        level = initial_state.level
+        record = struct.Struct('>QQHI%dI' % len(initial_state.boxes))
+        capacity = max(1, self.memory_limit // (record.size + self.RECORD_OVERHEAD))
+        workdir = tempfile.mkdtemp(prefix='sokoban-bfs-', dir=self.directory)
+        layers = []
+        try:
+            root = record.pack(initial_state.key, 0, 0, initial_state.player, *initial_state.boxes)
+            layers.append(SortedRun.write(os.path.join(workdir, 'layer0'), [root], record.size))
+            while len(layers[-1]):
+                depth = len(layers)
+                runs = []
+                buffer = []
+                for data in layers[-1]:
+                    key, _, _, player, *boxes = record.unpack(data)
+                    state = SokobanPuzzle.from_positions(level, player, tuple(boxes), key)
+                    search.expand()
+                    for action, child in search.successors(state, push_moves):
+                        child_data = record.pack(child.key, key, nodes.encode(state, action),
+                                                 child.player, *child.boxes)
+                        if child.isGoal():
+                            codes = self._trace(layers, record, child_data)
+                            return nodes.follow(codes)
+                        buffer.append(child_data)
+                        search.generated += 1
+                        if len(buffer) >= capacity:
+                            runs.append(self._spill(workdir, depth, len(runs), buffer, record.size))
+                            buffer = []
+                buffer.sort()
+                merged = heapq.merge(*runs, buffer)
+                path = os.path.join(workdir, 'layer%d' % depth)
+                layers.append(SortedRun.write(path, self._new_records(merged, layers), record.size))
+                for run in runs:
+                    run.close()
+            return None
+        finally:
+            for layer in layers:
+                layer.close()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def _spill(self, workdir, depth, index, buffer, record_size):
+        buffer.sort()
+        self.spills += 1
+        path = os.path.join(workdir, 'spill%d-%d' % (depth, index))
+        return SortedRun.write(path, buffer, record_size)
+
+    def _new_records(self, merged, layers):
+        #Drop repeated keys of the merged stream and keys of earlier layers;
+        #the stream ascends, so each layer is searched forward from a cursor
+        cursors = [0] * len(layers)
+        last = None
+        for data in merged:
+            key = SortedRun.KEY.unpack_from(data)[0]
+            if key == last:
+                continue
+            last = key
+            seen = False
+            for i, layer in enumerate(layers):
+                position = layer.lower_bound(key, cursors[i])
+                cursors[i] = position
+                if position < len(layer) and layer.key(position) == key:
+                    seen = True
+                    break
+            if not seen:
+                yield data
+
+    def _trace(self, layers, record, data):
+        #Action codes from the root to the record data, one layer per step
+        codes = []
+        for layer in reversed(layers):
+            _, parent, code, *_ = record.unpack(data)
+            codes.append(code)
+            data = layer.find(parent)
+        codes.reverse()
+        return codes
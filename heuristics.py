@@ -0,0 +1,325 @@
+from collections import OrderedDict, namedtuple
+from itertools import combinations
+from level import PushDistanceTable
+from patterndb import PatternDatabase
+from sokoban import Push
+
+
+class Move(namedtuple('Move', ['parent', 'state', 'box_from', 'box_to'])):
+    """
+    What changed between a parent state and one of its successors:
+    box_from/box_to are the cells of the pushed box, or None when the
+    player only walked.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def between(cls, parent, action, state):
+        level = state.level
+        if isinstance(action, Push):
+            return cls(parent, state, action.box, level.neighbours[action.box][action.direction])
+        if state.player in parent.boxes:
+            d = level.ACTIONS.index(action)
+            return cls(parent, state, state.player, level.neighbours[state.player][d])
+        return cls(parent, state, None, None)
+
+
+class Heuristic:
+    """
+    Incremental heuristic protocol used by Search.astar: evaluate() does a
+    full evaluation of the initial state, then update(parent_h, move) turns
+    the parent's value into the child's. Heuristics that cannot do better
+    keep the default update, which is a full evaluation of the child.
+    The base class itself is the zero heuristic.
+
+    Heuristics only read level, player, boxes and the query methods of the
+    state, so a mutable Board can stand in for it, unless needs_states is
+    set: such heuristics cache data per state and must be given immutable
+    SokobanPuzzle states.
+    """
+    name = "h0"
+    needs_states = False
+
+    def evaluate(self, state):
+        return 0
+
+    def update(self, parent_h, move):
+        return self.evaluate(move.state)
+
+
+class MisplacedBoxes(Heuristic):
+    """h1: number of boxes not on a storage point."""
+    name = "h1"
+
+    def evaluate(self, state):
+        return state.misplaced_boxes()
+
+    def update(self, parent_h, move):
+        if move.box_from is None:
+            return parent_h
+        target_mask = move.state.level.target_mask
+        return parent_h + target_mask[move.box_from] - target_mask[move.box_to]
+
+
+class NearestTargetDistance(Heuristic):
+    """h2: pushes each box needs to reach its nearest storage, walls included."""
+    name = "h2"
+
+    def evaluate(self, state):
+        nearest = state.level.push_distances().nearest
+        total_distance = 0
+        for box in state.boxes:
+            total_distance += nearest[box]  # 0 for a box on storage
+        return total_distance
+
+    def update(self, parent_h, move):
+        if move.box_from is None:
+            return parent_h
+        nearest = move.state.level.push_distances().nearest
+        return parent_h - nearest[move.box_from] + nearest[move.box_to]
+
+
+class PlayerBoxDistance(Heuristic):
+    """h3: h2 plus the player's Manhattan distance to the nearest misplaced box."""
+    name = "h3"
+
+    def __init__(self):
+        self.box_distance = NearestTargetDistance()
+
+    def evaluate(self, state):
+        if state.player is None:
+            return float('inf')
+        box_to_storage = self.box_distance.evaluate(state)
+        player_x, player_y = state.findPlayer()
+        level = state.level
+        min_dist_to_box = None
+        for box in state.boxes:
+            if not level.target_mask[box]:
+                i, j = level.position(box)
+                dist = abs(player_x - i) + abs(player_y - j)
+                if min_dist_to_box is None or dist < min_dist_to_box:
+                    min_dist_to_box = dist
+        if min_dist_to_box is None:
+            return 0
+        return box_to_storage + min_dist_to_box
+
+
+class MatchingHeuristic(Heuristic):
+    """
+    Minimum-cost perfect matching between boxes and targets ("hm").
+    The cost of sending a box to a target is the number of pushes it needs
+    on an empty board (the level's PushDistanceTable), so the matching cost never
+    overestimates the remaining pushes, and therefore the remaining steps.
+
+    The matching is solved with the Hungarian algorithm (shortest augmenting
+    paths with row/column potentials) on a square matrix: when there are
+    more targets than boxes, zero-cost dummy rows fill it up, so every
+    column stays matched and freeing one row leaves exactly one free column.
+    The potentials and assignment of recently evaluated states are kept, so
+    a child whose only change is one moved box is re-solved with a single
+    augmentation, O(n^2) instead of O(n^3).
+    """
+    name = "hm"
+    needs_states = True
+    INFINITY = float('inf')
+    # cost of "this box can never reach this target"
+    UNREACHABLE = PushDistanceTable.UNREACHABLE
+
+    def __init__(self, cache_size=4096):
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+
+    def evaluate(self, state, parent=None):
+        """Matching cost of state; parent is used for an incremental update."""
+        if len(state.boxes) > state.level.target_count:
+            return self.INFINITY
+        data = None
+        if parent is not None and parent.level is state.level:
+            moved = self._moved_box(parent, state)
+            if moved is not None:
+                data = self._update(state, self._lookup(parent), moved)
+        if data is None:
+            data = self._solve(state)
+        self._store(state, data)
+        return self._cost(state, data)
+
+    def update(self, parent_h, move):
+        if move.box_from is None:
+            return parent_h
+        if len(move.state.boxes) > move.state.level.target_count:
+            return self.INFINITY
+        data = self._update(move.state, self._lookup(move.parent), (move.box_from, move.box_to))
+        self._store(move.state, data)
+        return self._cost(move.state, data)
+
+    def _lookup(self, state):
+        data = self.cache.get(state)
+        if data is None:
+            data = self._solve(state)
+            self._store(state, data)
+        return data
+
+    def _store(self, state, data):
+        self.cache[state] = data
+        self.cache.move_to_end(state)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def _moved_box(self, parent, state):
+        #(old cell, new cell) if exactly one box moved, () if none, else None
+        if parent.boxes == state.boxes:
+            return ()
+        old = set(parent.boxes).difference(state.boxes)
+        new = set(state.boxes).difference(parent.boxes)
+        if len(old) == 1 and len(new) == 1:
+            return old.pop(), new.pop()
+        return None
+
+    def _costs(self, level, box):
+        # 1-based columns, index 0 unused
+        return [self.UNREACHABLE] + level.push_distances().row(box).tolist()
+
+    def _solve(self, state):
+        #data = (rows, costs, u, v, p): rows[i] is the cell of box i (None for
+        #dummy rows), p[j] the 1-based row matched to target j
+        level = state.level
+        dummies = level.target_count - len(state.boxes)
+        rows = list(state.boxes) + [None] * dummies
+        costs = [self._costs(level, box) for box in state.boxes]
+        costs += [[0] * (level.target_count + 1)] * dummies
+        u = [0] * (len(rows) + 1)
+        v = [0] * (level.target_count + 1)
+        p = [0] * (level.target_count + 1)
+        for i in range(1, len(rows) + 1):
+            self._augment(i, costs, u, v, p)
+        return rows, costs, u, v, p
+
+    def _update(self, state, parent_data, moved):
+        if moved == ():
+            return parent_data
+        old, new = moved
+        rows, costs, u, v, p = parent_data
+        rows = list(rows)
+        costs = list(costs)
+        u = list(u)
+        v = list(v)
+        p = list(p)
+        i = rows.index(old) + 1
+        rows[i - 1] = new
+        costs[i - 1] = self._costs(state.level, new)
+        # free the moved box and add it back with its new costs; its potential
+        # may start anywhere, the first step of the augmentation fixes it
+        for j in range(len(p)):
+            if p[j] == i:
+                p[j] = 0
+        u[i] = 0
+        self._augment(i, costs, u, v, p)
+        return rows, costs, u, v, p
+
+    def _augment(self, i, costs, u, v, p):
+        #one shortest augmenting path adding row i (e-maxx formulation)
+        m = len(v) - 1
+        way = [0] * (m + 1)
+        minv = [self.INFINITY] * (m + 1)
+        used = [False] * (m + 1)
+        p[0] = i
+        j0 = 0
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            row = costs[i0 - 1]
+            delta = self.INFINITY
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = row[j] - u[i0] - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+        p[0] = 0
+
+    def _cost(self, state, data):
+        rows, costs, u, v, p = data
+        total = 0
+        for j in range(1, len(p)):
+            if rows[p[j] - 1] is not None:
+                cost = costs[p[j] - 1][j]
+                if cost >= self.UNREACHABLE:
+                    return self.INFINITY
+                total += cost
+        return total
+
+
+class PatternDatabaseHeuristic(Heuristic):
+    """
+    "hp": pattern database lookups (see patterndb.py) on top of h2.
+    Every box starts out as its own pattern costing its nearest-target
+    distance; each group of pattern_size boxes whose database cost is
+    higher than the sum of its members' distances gains the difference.
+    With combine="add" the boxes are split greedily into disjoint groups,
+    largest gain first, and the gains are added up; with combine="max"
+    only the best single group counts. Either way each push is counted by
+    one pattern at most, so h never overestimates. A group the database
+    marks unsolvable makes the state a deadlock (infinite h).
+    """
+    name = "hp"
+    INFINITY = float('inf')
+
+    def __init__(self, pattern_size=2, combine="add", directory=None):
+        self.pattern_size = pattern_size
+        self.combine = combine
+        self.directory = directory
+        # database of the last level seen, looked up again on a new level
+        self._level = None
+        self._database = None
+
+    def database(self, level):
+        if level is not self._level:
+            self._database = PatternDatabase.for_level(level, self.pattern_size, self.directory)
+            self._level = level
+        return self._database
+
+    def evaluate(self, state):
+        level = state.level
+        boxes = state.boxes
+        nearest = level.push_distances().nearest
+        singles = [nearest[box] for box in boxes]
+        total = sum(singles)
+        if len(boxes) < self.pattern_size or level.target_count < self.pattern_size:
+            return total
+        database = self.database(level)
+        gains = []
+        for group in combinations(range(len(boxes)), self.pattern_size):
+            cost = database.cost([boxes[i] for i in group])
+            if cost == database.UNSOLVABLE:
+                return self.INFINITY
+            gain = cost - sum(singles[i] for i in group)
+            if gain > 0:
+                gains.append((gain, group))
+        if not gains:
+            return total
+        if self.combine == "max":
+            return total + max(gains)[0]
+        gains.sort(reverse=True)
+        used = set()
+        for gain, group in gains:
+            if used.isdisjoint(group):
+                used.update(group)
+                total += gain
+        return total
@@ -0,0 +1,261 @@
+import random
+from array import array
+
+
+class Level:
+    """
+    Static part of a Sokoban puzzle: everything that never moves.
+    Walls and storage points are the same for every state of a puzzle,
+    so they are parsed once here and shared by all SokobanPuzzle states.
+    Cells are addressed by a single index: row * width + col.
+
+    The analysis below is done once per puzzle so that states never have
+    to scan the grid: wall and target masks, the neighbour table of every
+    cell, the interior region reachable from the player, the target count
+    and the simple dead squares (cells from which a box can never be pushed
+    onto any target).
+    """
+    WALL = 'O'
+    STORAGE_SYMBOLS = ('S', '.', '*')
+    PLAYER_SYMBOLS = ('R', '.')
+    BOX_SYMBOLS = ('B', '*')
+    ZOBRIST_SEED = 0x50C0BA9
+
+    # Move order used everywhere: index d in a neighbour row is DIRECTIONS[d]
+    DIRECTIONS = {
+        'right': (0, 1),
+        'left': (0, -1),
+        'up': (-1, 0),
+        'down': (1, 0)
+    }
+    ACTIONS = tuple(DIRECTIONS)
+    OPPOSITE = (1, 0, 3, 2)
+
+    def __init__(self, grid):
+        self.height = len(grid)
+        self.width = max(len(row) for row in grid)
+        walls = set()
+        targets = set()
+        start = None
+        for row in range(self.height):
+            for col in range(self.width):
+                # ragged rows are padded with walls
+                cell = grid[row][col] if col < len(grid[row]) else self.WALL
+                index = row * self.width + col
+                if cell == self.WALL:
+                    walls.add(index)
+                elif cell in self.STORAGE_SYMBOLS:
+                    targets.add(index)
+                if cell in self.PLAYER_SYMBOLS:
+                    start = index
+        self.walls = frozenset(walls)
+        self.targets = frozenset(targets)
+        self.target_count = len(targets)
+        # cell and (row, col) of every target, sorted for a stable order
+        self.target_cells = sorted(targets)
+        self.target_positions = [self.position(target) for target in self.target_cells]
+
+        size = self.width * self.height
+        self.wall_mask = bytearray(size)
+        self.target_mask = bytearray(size)
+        for wall in walls:
+            self.wall_mask[wall] = 1
+        for target in targets:
+            self.target_mask[target] = 1
+
+        # neighbours[cell][d]: the cell one step in direction d, or -1 when it
+        # is a wall or off the grid
+        self.neighbours = []
+        for index in range(size):
+            row, col = divmod(index, self.width)
+            cells = []
+            for dir_x, dir_y in self.DIRECTIONS.values():
+                next_row, next_col = row + dir_x, col + dir_y
+                if self.in_bounds(next_row, next_col) and not self.wall_mask[next_row * self.width + next_col]:
+                    cells.append(next_row * self.width + next_col)
+                else:
+                    cells.append(-1)
+            self.neighbours.append(tuple(cells))
+
+        self.interior = self.flood_fill(start) if start is not None else frozenset()
+        self.dead_mask = self.find_dead_squares()
+        self._push_distances = None
+
+        # Zobrist tables: one random 64-bit number per (piece, cell).
+        # A fixed seed keeps state keys reproducible from run to run.
+        rng = random.Random(self.ZOBRIST_SEED)
+        self.zobrist_player = [rng.getrandbits(64) for _ in range(size)]
+        self.zobrist_box = [rng.getrandbits(64) for _ in range(size)]
+
+    def parse_state(self, grid):
+        #Return the player cell and the sorted tuple of box cells found in grid
+        player = None
+        boxes = []
+        for row in range(len(grid)):
+            for col in range(len(grid[row])):
+                cell = grid[row][col]
+                if cell in self.PLAYER_SYMBOLS:
+                    player = row * self.width + col
+                elif cell in self.BOX_SYMBOLS:
+                    boxes.append(row * self.width + col)
+        return player, tuple(sorted(boxes))
+
+    def flood_fill(self, start, blocked=()):
+        #Cells reachable from start without crossing walls or blocked cells
+        region = {start}
+        stack = [start]
+        neighbours = self.neighbours
+        while stack:
+            cell = stack.pop()
+            for next_cell in neighbours[cell]:
+                if next_cell >= 0 and next_cell not in region and next_cell not in blocked:
+                    region.add(next_cell)
+                    stack.append(next_cell)
+        return frozenset(region)
+
+    def find_dead_squares(self):
+        #Reverse "pull" BFS from every target, ignoring other boxes: a box
+        #can be pulled from b to b+d when b+d and b+2d are both floor. Any
+        #floor cell never reached cannot bring a box to a target.
+        live = set(self.targets)
+        queue = list(self.targets)
+        neighbours = self.neighbours
+        while queue:
+            box = queue.pop()
+            for d, box_from in enumerate(neighbours[box]):
+                if box_from < 0 or box_from in live:
+                    continue
+                if neighbours[box_from][d] >= 0:  # room for the pulling player
+                    live.add(box_from)
+                    queue.append(box_from)
+        dead_mask = bytearray(self.width * self.height)
+        for cell in range(len(dead_mask)):
+            if not self.wall_mask[cell] and cell not in live:
+                dead_mask[cell] = 1
+        return dead_mask
+
+    def layout_key(self):
+        #Identifies the static layout: equal keys mean identical walls and targets
+        return (self.width, self.height, bytes(self.wall_mask), bytes(self.target_mask))
+
+    def canonical_text(self, player, boxes):
+        #XSB text of a position that does not depend on how the level was
+        #written down: floor the player can never reach counts as wall, and
+        #the grid is cropped to the reachable area plus a one-cell border
+        reachable = self.flood_fill(player)
+        rows = [cell // self.width for cell in reachable]
+        cols = [cell % self.width for cell in reachable]
+        boxes = set(boxes)
+        lines = []
+        for row in range(min(rows) - 1, max(rows) + 2):
+            line = []
+            for col in range(min(cols) - 1, max(cols) + 2):
+                cell = row * self.width + col
+                if not self.in_bounds(row, col) or cell not in reachable:
+                    line.append('#')
+                elif cell == player:
+                    line.append('+' if self.target_mask[cell] else '@')
+                elif cell in boxes:
+                    line.append('*' if self.target_mask[cell] else '$')
+                else:
+                    line.append('.' if self.target_mask[cell] else ' ')
+            lines.append(''.join(line))
+        return '\n'.join(lines)
+
+    def push_distances(self):
+        #PushDistanceTable of this layout, built on first use and shared
+        #through a cache with every Level that has the same layout
+        if self._push_distances is None:
+            key = self.layout_key()
+            table = PushDistanceTable.cache.get(key)
+            if table is None:
+                table = PushDistanceTable(self)
+                if len(PushDistanceTable.cache) >= PushDistanceTable.CACHE_SIZE:
+                    # drop the oldest layout
+                    del PushDistanceTable.cache[next(iter(PushDistanceTable.cache))]
+                PushDistanceTable.cache[key] = table
+            self._push_distances = table
+        return self._push_distances
+
+    def zobrist_key(self, player, boxes):
+        #Full Zobrist key of a state, used once for the initial state
+        key = self.zobrist_player[player] if player is not None else 0
+        for box in boxes:
+            key ^= self.zobrist_box[box]
+        return key
+
+    def index(self, row, col):
+        return row * self.width + col
+
+    def position(self, index):
+        #(row, col) of a cell index
+        return divmod(index, self.width)
+
+    def in_bounds(self, row, col):
+        return 0 <= row < self.height and 0 <= col < self.width
+
+    def render(self, player, boxes):
+        #Build a list-of-lists grid in the project alphabet for the given positions
+        grid = []
+        for row in range(self.height):
+            line = []
+            for col in range(self.width):
+                index = row * self.width + col
+                on_target = index in self.targets
+                if self.wall_mask[index]:
+                    line.append(self.WALL)
+                elif index == player:
+                    line.append('.' if on_target else 'R')
+                elif index in boxes:
+                    line.append('*' if on_target else 'B')
+                else:
+                    line.append('S' if on_target else ' ')
+            grid.append(line)
+        return grid
+
+
+class PushDistanceTable:
+    """
+    True box-push distances from every cell to every target of a layout:
+    the fewest pushes that bring a box from the cell to the target on an
+    otherwise empty board. Built once by a reverse pull BFS per target and
+    stored cell-major in a flat array of unsigned 16-bit integers, so
+    distance lookups are O(1) and the row of a cell is one slice.
+    Tables are cached by Level.layout_key(), so re-solving a level or
+    solving another start position of the same layout skips the BFS.
+    """
+    UNREACHABLE = 0xFFFF
+    CACHE_SIZE = 64
+    cache = {}
+
+    def __init__(self, level):
+        self.target_count = level.target_count
+        size = level.width * level.height
+        self.distances = array('H', [self.UNREACHABLE]) * (size * self.target_count)
+        # distance from each cell to its nearest target
+        self.nearest = array('H', [self.UNREACHABLE]) * size
+        neighbours = level.neighbours
+        count = self.target_count
+        for t, target in enumerate(level.target_cells):
+            self.distances[target * count + t] = 0
+            queue = [target]
+            for box in queue:
+                distance = self.distances[box * count + t] + 1
+                for d, box_from in enumerate(neighbours[box]):
+                    if box_from < 0 or self.distances[box_from * count + t] != self.UNREACHABLE:
+                        continue
+                    if neighbours[box_from][d] >= 0:  # room for the pulling player
+                        self.distances[box_from * count + t] = distance
+                        queue.append(box_from)
+        for cell in range(size):
+            row = self.distances[cell * count:(cell + 1) * count]
+            if row:
+                self.nearest[cell] = min(row)
+
+    def distance(self, cell, t):
+        #pushes from cell to the t-th target of Level.target_cells
+        return self.distances[cell * self.target_count + t]
+
+    def row(self, cell):
+        #distances from cell to every target, in Level.target_cells order
+        return self.distances[cell * self.target_count:(cell + 1) * self.target_count]
@@ -0,0 +1,107 @@
+import functools
+import os
+import sys
+import threading
+from collections import namedtuple
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Search outcomes, see SearchResult
+SOLVED = "solved"
+UNSOLVABLE = "unsolvable"
+NODE_LIMIT = "node_limit"
+TIME_LIMIT = "time_limit"
+MEMORY_LIMIT = "memory_limit"
+CANCELLED = "cancelled"
+ERROR = "error"  # every strategy of a Portfolio failed
+LIMIT_STATUSES = (NODE_LIMIT, TIME_LIMIT, MEMORY_LIMIT)
+
+
+class Limits(namedtuple('Limits', ['max_nodes', 'time_limit', 'max_memory', 'check_every'])):
+    """
+    Resource limits of a search: expanded nodes, seconds of wall-clock time
+    and bytes of resident memory; None means unlimited. The node limit is
+    exact; time, memory and the cancellation token are checked every
+    check_every expansions.
+    """
+    __slots__ = ()
+
+    def __new__(cls, max_nodes=None, time_limit=None, max_memory=None, check_every=1024):
+        return super().__new__(cls, max_nodes, time_limit, max_memory, check_every)
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation: another thread calls cancel() and the search
+    stops at its next check. Pass a multiprocessing Event as event to
+    cancel searches running in other processes.
+    """
+    def __init__(self, event=None):
+        self.event = event if event is not None else threading.Event()
+
+    def cancel(self):
+        self.event.set()
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+
+class SearchResult(namedtuple('SearchResult', ['status', 'node', 'expanded', 'generated', 'seconds', 'stats'],
+                              defaults=(None,))):
+    """Outcome of a search: status, solution node (or None), the counters so
+    far and the SearchStats when the search collected them."""
+    __slots__ = ()
+
+    @property
+    def solved(self):
+        return self.status == SOLVED
+
+
+class SearchStopped(Exception):
+    """Raised inside a search when a limit is hit or it is cancelled."""
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+def memory_usage():
+    #Resident memory of this process in bytes, or None if unknown
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    # peak rather than current usage
+    return peak_memory()
+
+
+def peak_memory():
+    """Peak resident memory of this process in bytes, or None if unknown (Windows)."""
+    if resource is None:
+        return None
+    # kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def stoppable(search_method):
+    """
+    Decorator of the Search entry points: resets the counters, turns a
+    SearchStopped into a None return, and records the outcome in
+    search.result.
+    """
+    @functools.wraps(search_method)
+    def run(search, *args, **kwargs):
+        search.start()
+        try:
+            node = search_method(search, *args, **kwargs)
+        except SearchStopped as stop:
+            search.finish(stop.status, None)
+            return None
+        search.finish(SOLVED if node is not None else UNSOLVABLE, node)
+        return node
+    return run
@@ -1,10 +1,14 @@
 import pygame
 from search import Search
+from parallel import Portfolio
+from limits import CancellationToken, Limits
+from solution_cache import SolutionCache
 from node import Node
 from sokoban import SokobanPuzzle
 import os
 from typing import Dict, List, Optional
 import sys
+import threading
 
 class SokobanGame:
     # Define constants
@@ -12,6 +16,8 @@ class SokobanGame:
     BUTTON_HEIGHT = 40
     BUTTON_WIDTH = 200
     BUTTON_MARGIN = 20
+    ANYTIME_SECONDS = 5  # time budget of the anytime search
+    SEARCH_SECONDS = 60  # any search is stopped after this long
     
     # Colors
     WHITE = (255, 255, 255)
@@ -25,6 +31,7 @@ class SokobanGame:
     ALGORITHM_SELECT = "algorithm_select"
     PLAYING = "playing"
     SOLUTION = "solution"
+    SEARCHING = "searching"
     
     SYMBOLS = {
         'PLAYER': 'R',
@@ -40,12 +47,22 @@ class SokobanGame:
         pygame.init()
         pygame.font.init()
         self.font = pygame.font.SysFont('Arial', 24)
+        self.small_font = pygame.font.SysFont('Arial', 14)
         self.examples = self._load_examples()
         self.images = self._load_images()
         self.selected_example = 0
         self.selected_algorithm = None
         self.selected_heuristic = "h1"
-        self.search = Search()
+        self.push_moves = False
+        limits = Limits(time_limit=self.SEARCH_SECONDS)
+        # solutions of previous runs are reused from an on-disk cache
+        self.search = Search(limits=limits, cache=SolutionCache(), stats=True)
+        self.portfolio = Portfolio(limits=limits)
+        # the search runs in a background thread so the window stays responsive
+        self.search_thread = None
+        self.cancel_token = None
+        self.search_outcome = None
+        self.search_stats = None  # SearchStats of the solution on screen
         self.game_state = self.MENU
         self.solution_path = None
         self.current_step = 0
@@ -138,10 +155,13 @@ class SokobanGame:
         title_rect = title.get_rect(centerx=self.window_width // 2, y=self.BUTTON_MARGIN)
         self.screen.blit(title, title_rect)
         
+        # first button row, just below the title
+        top = self.BUTTON_HEIGHT + 2 * self.BUTTON_MARGIN
+        
         # BFS button
         bfs_rect = pygame.Rect(
             (self.window_width - self.BUTTON_WIDTH) // 2,
-            self.window_height // 3,
+            top,
             self.BUTTON_WIDTH,
             self.BUTTON_HEIGHT
         )
@@ -151,7 +171,7 @@ class SokobanGame:
         # A* buttons
         astar_rect = pygame.Rect(
             (self.window_width - self.BUTTON_WIDTH) // 2,
-            self.window_height // 3 + self.BUTTON_HEIGHT + 10,
+            top + self.BUTTON_HEIGHT + 10,
             self.BUTTON_WIDTH,
             self.BUTTON_HEIGHT
         )
@@ -161,7 +181,7 @@ class SokobanGame:
         
         astar_h2_rect = pygame.Rect(
             (self.window_width - self.BUTTON_WIDTH) // 2,
-            self.window_height // 3 + 2 * (self.BUTTON_HEIGHT + 10),
+            top + 2 * (self.BUTTON_HEIGHT + 10),
             self.BUTTON_WIDTH,
             self.BUTTON_HEIGHT
         )
@@ -171,7 +191,7 @@ class SokobanGame:
         
         astar_h3_rect = pygame.Rect(
             (self.window_width - self.BUTTON_WIDTH) // 2,
-            self.window_height // 3 + 3 * (self.BUTTON_HEIGHT + 10),
+            top + 3 * (self.BUTTON_HEIGHT + 10),
             self.BUTTON_WIDTH,
             self.BUTTON_HEIGHT
         )
@@ -179,6 +199,56 @@ class SokobanGame:
                         self.selected_algorithm == "A*" and self.selected_heuristic == "h3")
         buttons.append(astar_h3_rect)
         
+        astar_hm_rect = pygame.Rect(
+            (self.window_width - self.BUTTON_WIDTH) // 2,
+            top + 4 * (self.BUTTON_HEIGHT + 10),
+            self.BUTTON_WIDTH,
+            self.BUTTON_HEIGHT
+        )
+        self.draw_button("A* (hm)", astar_hm_rect,
+                        self.selected_algorithm == "A*" and self.selected_heuristic == "hm")
+        buttons.append(astar_hm_rect)
+        
+        # IDA* button
+        ida_rect = pygame.Rect(
+            (self.window_width - self.BUTTON_WIDTH) // 2,
+            top + 5 * (self.BUTTON_HEIGHT + 10),
+            self.BUTTON_WIDTH,
+            self.BUTTON_HEIGHT
+        )
+        self.draw_button("IDA* (h2)", ida_rect, self.selected_algorithm == "IDA*")
+        buttons.append(ida_rect)
+        
+        # Anytime A* button
+        anytime_rect = pygame.Rect(
+            (self.window_width - self.BUTTON_WIDTH) // 2,
+            top + 6 * (self.BUTTON_HEIGHT + 10),
+            self.BUTTON_WIDTH,
+            self.BUTTON_HEIGHT
+        )
+        self.draw_button("Anytime A* (hm)", anytime_rect, self.selected_algorithm == "Anytime A*")
+        buttons.append(anytime_rect)
+        
+        # Portfolio button
+        portfolio_rect = pygame.Rect(
+            (self.window_width - self.BUTTON_WIDTH) // 2,
+            top + 7 * (self.BUTTON_HEIGHT + 10),
+            self.BUTTON_WIDTH,
+            self.BUTTON_HEIGHT
+        )
+        self.draw_button("Portfolio", portfolio_rect, self.selected_algorithm == "Portfolio")
+        buttons.append(portfolio_rect)
+        
+        # Push-level search toggle
+        push_rect = pygame.Rect(
+            (self.window_width - self.BUTTON_WIDTH) // 2,
+            top + 8 * (self.BUTTON_HEIGHT + 10),
+            self.BUTTON_WIDTH,
+            self.BUTTON_HEIGHT
+        )
+        self.draw_button("Push moves: " + ("on" if self.push_moves else "off"), push_rect, self.push_moves)
+        buttons.append(push_rect)
+        
         # Back button
         back_rect = pygame.Rect(
             (self.window_width - self.BUTTON_WIDTH) // 2,
@@ -267,9 +337,14 @@ class SokobanGame:
                 buttons = self.draw_level_select()
             elif self.game_state == self.ALGORITHM_SELECT:
                 buttons = self.draw_algorithm_select()
+            elif self.game_state == self.SEARCHING:
+                buttons = self.draw_searching()
+                if not self.search_thread.is_alive():
+                    self.finish_search()
             elif self.game_state == self.SOLUTION:
                 if self.solution_path and self.current_step < len(self.solution_path):
                     self.draw_grid(self.solution_path[self.current_step].grid)
+                    self.draw_stats(len(self.solution_path[self.current_step].grid) * self.TILE_SIZE)
                 buttons = self.draw_solution_controls()
             
             pygame.display.flip()
@@ -277,6 +352,9 @@ class SokobanGame:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
+                    if self.game_state == self.SEARCHING:
+                        self.cancel_token.cancel()
+                        self.search_thread.join()
                 
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     mouse_pos = pygame.mouse.get_pos()
@@ -313,9 +391,30 @@ class SokobanGame:
                 self.selected_algorithm = "A*"
                 self.selected_heuristic = f"h{button_index}"
                 self.run_search()
-            elif button_index == 4:  # Back button
+            elif button_index == 4:  # A* with the matching heuristic
+                self.selected_algorithm = "A*"
+                self.selected_heuristic = "hm"
+                self.run_search()
+            elif button_index == 5:  # IDA*
+                self.selected_algorithm = "IDA*"
+                self.selected_heuristic = "h2"
+                self.run_search()
+            elif button_index == 6:  # Anytime A*
+                self.selected_algorithm = "Anytime A*"
+                self.selected_heuristic = "hm"
+                self.run_search()
+            elif button_index == 7:  # Portfolio
+                self.selected_algorithm = "Portfolio"
+                self.run_search()
+            elif button_index == 8:  # Push moves toggle
+                self.push_moves = not self.push_moves
+            elif button_index == 9:  # Back button
                 self.game_state = self.LEVEL_SELECT
         
+        elif self.game_state == self.SEARCHING:
+            if button_index == 0:  # Cancel
+                self.cancel_token.cancel()
+        
         elif self.game_state == self.SOLUTION:
             if button_index == 0 and self.current_step > 0:  # Previous
                 self.current_step -= 1
@@ -327,26 +426,82 @@ class SokobanGame:
                 self.current_step = 0
 
     def run_search(self) -> None:
-        # Run the selected search algorithm and transition to solution state.
+        # Start the selected search algorithm in a background thread.
         initial_state = SokobanPuzzle(self.examples[self.selected_example])
-
+        self.cancel_token = CancellationToken()
+        self.search.cancel = self.cancel_token
+        self.portfolio.cancel = self.cancel_token
+        self.search_outcome = None
+        self.search_thread = threading.Thread(target=self._search_worker, args=(initial_state,), daemon=True)
+        self.search_thread.start()
+        self.game_state = self.SEARCHING
+
+    def _search_worker(self, initial_state: SokobanPuzzle) -> None:
+        # Body of the search thread: stores (solution node, error)
         try:
             if self.selected_algorithm == "BFS":
-                solution_node = self.search.BFS(initial_state)
+                solution_node = self.search.solve(initial_state, "bfs", self.push_moves)
+            elif self.selected_algorithm == "IDA*":  # step moves only
+                solution_node = self.search.solve(initial_state, f"ida:{self.selected_heuristic}")
+            elif self.selected_algorithm == "Anytime A*":
+                # keep the last (cheapest) solution found within the time budget
+                solution_node = None
+                for solution_node, bound in self.search.anytime_astar(
+                        initial_state, self.selected_heuristic, self.push_moves,
+                        time_limit=self.ANYTIME_SECONDS):
+                    pass
+            elif self.selected_algorithm == "Portfolio":
+                self.portfolio.push_moves = self.push_moves
+                solution_node = self.portfolio.solve(initial_state)
             else:  # A*
-                solution_node = self.search.astar(initial_state, self.selected_heuristic)
-
-            if solution_node:
-                self.solution_path = solution_node.getPath()
-                self.current_step = 0
-                self.g_cost = solution_node.g  # Access the g value from the solution node
-                self.game_state = self.SOLUTION
-            else:
-                # You might want to show a "No solution found" message here
-                self.game_state = self.MENU
+                solution_node = self.search.solve(initial_state, f"astar:{self.selected_heuristic}",
+                                                  self.push_moves)
+            self.search_outcome = (solution_node, None)
         except Exception as e:
-            print(f"Error during search: {e}")
+            self.search_outcome = (None, e)
+
+    def finish_search(self) -> None:
+        # Transition to the solution state once the search thread is done.
+        solution_node, error = self.search_outcome
+        if error is not None:
+            print(f"Error during search: {error}")
             self.game_state = self.MENU
+        elif solution_node:
+            self.solution_path = solution_node.getPath()
+            self.current_step = 0
+            self.g_cost = solution_node.g  # Access the g value from the solution node
+            # the portfolio searches in other processes and keeps no stats
+            self.search_stats = None if self.selected_algorithm == "Portfolio" else self.search.result.stats
+            self.game_state = self.SOLUTION
+        else:
+            # unsolvable, cancelled or out of time: see self.search.result.status
+            self.game_state = self.MENU
+
+    def draw_stats(self, top: int) -> None:
+        #Draw the counters of the search that found the solution below the grid
+        if self.search_stats is None:
+            return
+        y = top + 5
+        for line in self.search_stats.lines():
+            text_surface = self.small_font.render(line, True, self.WHITE)
+            self.screen.blit(text_surface, (self.BUTTON_MARGIN // 2, y))
+            y += text_surface.get_height() + 2
+
+    def draw_searching(self) -> List[pygame.Rect]:
+        #Draw the "searching" screen and return the cancel button rectangle
+        self.screen.fill(self.BLACK)
+        title = self.font.render("Searching...", True, self.WHITE)
+        title_rect = title.get_rect(centerx=self.window_width // 2, y=self.window_height // 3)
+        self.screen.blit(title, title_rect)
+        
+        cancel_rect = pygame.Rect(
+            (self.window_width - self.BUTTON_WIDTH) // 2,
+            self.window_height // 2,
+            self.BUTTON_WIDTH,
+            self.BUTTON_HEIGHT
+        )
+        self.draw_button("Cancel", cancel_rect)
+        return [cancel_rect]
 
     # Keep your existing methods (_load_examples, _load_images, draw_grid)
     def _load_examples(self) -> List[List[List[str]]]:
@@ -1,4 +1,15 @@
+import logging
+from array import array
+from sokoban import Push, SokobanPuzzle
+
+logger = logging.getLogger(__name__)
+
+
 class Node:
+    # Opt-in per-node tracing: set Node.trace = True and enable DEBUG logging
+    # for the "node" logger to see every f/g/h computed by the searches
+    trace = False
+
     def __init__(self, state, parent=None, action=None, g=0):
         self.state = state       
         self.parent = parent    
@@ -9,6 +20,8 @@ class Node:
     
     def getPath(self):
         """Gives the list of states from the initial state to the goal node."""
+        if isinstance(self.action, Push):
+            return self.expandPushes()[1]
         path = []
         current_node = self
         while current_node is not None:
@@ -19,6 +32,8 @@ class Node:
 
     def getSolution(self):
         """Returns the actions taken to reach this node."""
+        if isinstance(self.action, Push):
+            return self.expandPushes()[0]
         actions = []
         current_node = self
         while current_node.parent is not None:
@@ -27,10 +42,21 @@ class Node:
         actions.reverse()  # Added reverse to get correct order
         return actions
 
+    def expandPushes(self):
+        """Step actions and states of a path built from Push macro moves."""
+        pushes = []
+        current_node = self
+        while current_node.parent is not None:
+            pushes.append(current_node.action)
+            current_node = current_node.parent
+        pushes.reverse()
+        return current_node.state.expandPushes(pushes)
+
     def setF(self):
         """Calculates the f-score as g + heuristic."""
         self.f = self.g + self.heuristic  # Implemented the f-score calculation
-        print(f"Node F-value: {self.f}, G-value: {self.g}, Heuristic: {self.heuristic}")
+        if Node.trace:
+            logger.debug("Node F-value: %s, G-value: %s, Heuristic: %s", self.f, self.g, self.heuristic)
 
     def __lt__(self, other):
         """Comparison method required for heapq operations."""
@@ -41,6 +67,246 @@ class Node:
         return f"Node(action={self.action}, g={self.g}, h={self.heuristic}, f={self.f})"
 
 
+class NodeTable:
+    """
+    Compact store of search nodes as parallel arrays instead of one Node
+    object per generated node: parent index, action code, g, h, the
+    state's Zobrist key and its packed positions (player cell, then the
+    sorted box cells, 16 bits each), 30 bytes plus 2 per box for each
+    node. States are not kept alive: state() rebuilds the state of a row,
+    and the path to a node is rebuilt on demand by replaying its action
+    codes from the root state, see TableNode.
+
+    Action codes fit in 16 bits: a step is its direction index in
+    Level.ACTIONS; a push is (index of the box in the parent's sorted
+    box tuple) * 4 + direction.
+    """
+    NO_PARENT = -1
+    NO_PLAYER = 0xFFFF  # stored for a state without a player
+
+    def __init__(self, root_state, push_moves=False):
+        self.root_state = root_state
+        self.push_moves = push_moves
+        self.parent = array('i')
+        self.action = array('H')
+        self.g = array('i')
+        self.h = array('d')  # doubles, so an infinite heuristic fits
+        self.key = array('Q')
+        # player and box cells of every row, width cells per row
+        self.width = 0 if root_state is None else len(root_state.boxes) + 1
+        self.positions = array('H')
+
+    def __len__(self):
+        return len(self.parent)
+
+    def add(self, state, parent=NO_PARENT, parent_state=None, action=None, g=0, h=0):
+        """Append a node and return its index."""
+        self.parent.append(parent)
+        self.action.append(0 if action is None else self.encode(parent_state, action))
+        self.g.append(g)
+        self.h.append(h)
+        self.key.append(state.key)
+        self.positions.append(self.NO_PLAYER if state.player is None else state.player)
+        self.positions.extend(state.boxes)
+        if Node.trace:
+            logger.debug("Node F-value: %s, G-value: %s, Heuristic: %s", g + h, g, h)
+        return len(self.parent) - 1
+
+    def state(self, index):
+        """State of the node at index, rebuilt from its stored positions."""
+        start = index * self.width
+        player = self.positions[start]
+        if player == self.NO_PLAYER:
+            player = None
+        boxes = tuple(self.positions[start + 1:start + self.width])
+        return SokobanPuzzle.from_positions(self.root_state.level, player, boxes, self.key[index])
+
+    def encode(self, parent_state, action):
+        if isinstance(action, Push):
+            return parent_state.boxes.index(action.box) * 4 + action.direction
+        return parent_state.level.ACTIONS.index(action)
+
+    def decode(self, parent_state, code):
+        if self.push_moves:
+            return Push(parent_state.boxes[code >> 2], code & 3)
+        return parent_state.level.ACTIONS[code]
+
+    def codes(self, index):
+        #action codes from the root to index
+        codes = []
+        while self.parent[index] != self.NO_PARENT:
+            codes.append(self.action[index])
+            index = self.parent[index]
+        codes.reverse()
+        return codes
+
+    def replay(self, index):
+        """Actions and states (root included) along the path to index."""
+        state = self.root_state
+        actions = []
+        states = [state]
+        for code in self.codes(index):
+            action = self.decode(state, code)
+            state = state.applyPush(action) if self.push_moves else state.move(action)
+            actions.append(action)
+            states.append(state)
+        return actions, states
+
+    def node(self, index, state=None):
+        """Node-compatible view of the node at index."""
+        return TableNode(self, index, state)
+
+    def follow(self, codes):
+        """Add the root and the path of action codes from it; view of the last node."""
+        state = self.root_state
+        index = self.add(state)
+        for g, code in enumerate(codes, 1):
+            action = self.decode(state, code)
+            child = state.applyPush(action) if self.push_moves else state.move(action)
+            index = self.add(child, index, state, action, g)
+            state = child
+        return self.node(index, state)
+
+
+class NodeSet:
+    """
+    Set of the states of NodeTable rows, for the closed sets of the
+    searches: an open-addressing hash table of row indexes probed with
+    the states' Zobrist keys, equal keys being confirmed on the stored
+    positions. A member costs 8 to 16 bytes on top of its row, against
+    a set entry plus a live SokobanPuzzle and its box tuple. size must
+    be a power of two.
+    """
+    def __init__(self, table, size=1024):
+        self.table = table
+        # the table's arrays only grow in place, so they can be kept here
+        self.keys = table.key
+        self.positions = table.positions
+        self.width = table.width
+        # row indexes, -1 for an empty slot
+        self.slots = array('i', [-1]) * size
+        self.mask = size - 1
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, state):
+        keys = self.keys
+        positions = self.positions
+        width = self.width
+        slots = self.slots
+        mask = self.mask
+        key = state.key
+        player = NodeTable.NO_PLAYER if state.player is None else state.player
+        slot = key & mask
+        index = slots[slot]
+        while index != -1:
+            if keys[index] == key:
+                start = index * width
+                if positions[start] == player and tuple(positions[start + 1:start + width]) == state.boxes:
+                    return True
+            slot = (slot + 1) & mask
+            index = slots[slot]
+        return False
+
+    def add(self, state, index):
+        """Add state as the state of row index; False if it is already a member."""
+        if (self.count + 1) * 2 > len(self.slots):
+            self._grow()
+        keys = self.keys
+        positions = self.positions
+        width = self.width
+        slots = self.slots
+        mask = self.mask
+        key = state.key
+        player = NodeTable.NO_PLAYER if state.player is None else state.player
+        slot = key & mask
+        member = slots[slot]
+        while member != -1:
+            if keys[member] == key:
+                start = member * width
+                if positions[start] == player and tuple(positions[start + 1:start + width]) == state.boxes:
+                    return False
+            slot = (slot + 1) & mask
+            member = slots[slot]
+        slots[slot] = index
+        self.count += 1
+        return True
+
+    def _grow(self):
+        #Double the slots, keeping at most half of them used
+        old = self.slots
+        slots = self.slots = array('i', [-1]) * (len(old) * 2)
+        mask = self.mask = len(slots) - 1
+        keys = self.keys
+        for index in old:
+            if index != -1:
+                slot = keys[index] & mask
+                while slots[slot] != -1:
+                    slot = (slot + 1) & mask
+                slots[slot] = index
+
+
+class TableNode:
+    """
+    Read-only Node look-alike backed by a NodeTable row, returned by the
+    searches so callers keep using g, heuristic, f, getPath and getSolution.
+    """
+    __slots__ = ('table', 'index', '_state')
+
+    def __init__(self, table, index, state=None):
+        self.table = table
+        self.index = index
+        self._state = state
+
+    @property
+    def state(self):
+        if self._state is None:
+            self._state = self.table.state(self.index)
+        return self._state
+
+    @property
+    def parent(self):
+        parent = self.table.parent[self.index]
+        return None if parent == NodeTable.NO_PARENT else TableNode(self.table, parent)
+
+    @property
+    def action(self):
+        if self.table.parent[self.index] == NodeTable.NO_PARENT:
+            return None
+        return self.table.replay(self.index)[0][-1]
+
+    @property
+    def g(self):
+        return self.table.g[self.index]
+
+    @property
+    def heuristic(self):
+        return self.table.h[self.index]
+
+    @property
+    def f(self):
+        return self.g + self.heuristic
+
+    def getPath(self):
+        """Gives the list of states from the initial state to this node."""
+        actions, states = self.table.replay(self.index)
+        if self.table.push_moves:
+            return self.table.root_state.expandPushes(actions)[1]
+        return states
+
+    def getSolution(self):
+        """Returns the step actions taken to reach this node."""
+        actions, states = self.table.replay(self.index)
+        if self.table.push_moves:
+            return self.table.root_state.expandPushes(actions)[0]
+        return actions
+
+    def __str__(self):
+        return f"Node(action={self.action}, g={self.g}, h={self.heuristic}, f={self.f})"
+
+
 """ class Node:
         
     def __init__(self, state, parent=None, action=None, g=0):
@@ -0,0 +1,92 @@
+import heapq
+
+
+class BucketQueue:
+    """
+    Open list for integer f-values: one bucket per f, and inside it one
+    LIFO stack per h, so push and pop are O(1) (amortized over the scan of
+    empty buckets). Entries with the smallest f come out first; among
+    equal f the smallest h, which for f = g + h is the same as the largest
+    g: the deepest node, the one closest to a goal. Equal (f, h) entries
+    come out last-in first-out.
+    f and h must be non-negative integers.
+    """
+    def __init__(self):
+        self.buckets = []  # buckets[f][h]: stack of entries
+        self.counts = []   # entries in buckets[f]
+        self.low = []      # no entry of buckets[f] has a smaller h
+        self.min_f = 0
+        self.size = 0
+        self.pushes = 0
+        self.pops = 0
+
+    def push(self, f, h, item):
+        f = int(f)
+        h = int(h)
+        while len(self.buckets) <= f:
+            self.buckets.append([])
+            self.counts.append(0)
+            self.low.append(0)
+        bucket = self.buckets[f]
+        while len(bucket) <= h:
+            bucket.append([])
+        bucket[h].append(item)
+        self.counts[f] += 1
+        if h < self.low[f]:
+            self.low[f] = h
+        # f only goes down with an inconsistent heuristic
+        if f < self.min_f or self.size == 0:
+            self.min_f = f
+        self.size += 1
+        self.pushes += 1
+
+    def pop(self):
+        if not self.size:
+            raise IndexError("pop from an empty queue")
+        f = self.min_f
+        while not self.counts[f]:
+            f += 1
+        self.min_f = f
+        bucket = self.buckets[f]
+        h = self.low[f]
+        while not bucket[h]:
+            h += 1
+        self.low[f] = h
+        self.counts[f] -= 1
+        self.size -= 1
+        self.pops += 1
+        return bucket[h].pop()
+
+    def __len__(self):
+        return self.size
+
+
+class HeapQueue:
+    """
+    Binary heap open list with the same interface as BucketQueue, kept for
+    comparison: O(log n) push and pop, ties on f broken by insertion order.
+    Works with any numeric f.
+    """
+    def __init__(self):
+        self.heap = []
+        self.counter = 0
+        self.pushes = 0
+        self.pops = 0
+
+    def push(self, f, h, item):
+        heapq.heappush(self.heap, (f, self.counter, item))
+        self.counter += 1
+        self.pushes += 1
+
+    def pop(self):
+        self.pops += 1
+        return heapq.heappop(self.heap)[2]
+
+    def __len__(self):
+        return len(self.heap)
+
+
+OPEN_LISTS = {
+    "bucket": BucketQueue,
+    "heap": HeapQueue,
+}
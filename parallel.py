@@ -0,0 +1,411 @@
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from collections import Counter
+from heuristics import MatchingHeuristic
+from limits import (CANCELLED, ERROR, LIMIT_STATUSES, NODE_LIMIT, SOLVED, TIME_LIMIT, UNSOLVABLE,
+                    Limits, SearchResult)
+from node import NodeTable
+from openlist import BucketQueue
+from search import Search
+from sokoban import SokobanPuzzle
+
+logger = logging.getLogger(__name__)
+
+
+def _hda_worker(me, workers, level, root, heuristic_type, push_moves, batch_size,
+                inboxes, results, incumbent, sent, received, idle, progress, stop):
+    #One HDA* worker: owns the states whose Zobrist key is me modulo workers.
+    #Entries sent between workers are (player, boxes, key, g, path), path
+    #being the NodeTable action codes from the root as bytes (push codes
+    #fit in a byte for up to 64 boxes).
+    search = Search()
+    heuristic = search.heuristic(heuristic_type)
+    encode = NodeTable(None, push_moves).encode
+    inbox = inboxes[me]
+    frontier = BucketQueue()
+    best = {}  # smallest g seen for each owned state
+    outbox = [[] for _ in range(workers)]
+    expanded = 0
+    generated = 0
+
+    def flush(owner):
+        if outbox[owner]:
+            # counted before the put, so sent never lags behind received
+            sent[me] += len(outbox[owner])
+            inboxes[owner].put(outbox[owner])
+            outbox[owner] = []
+
+    def insert(state, g, h, path):
+        if g >= best.get(state, g + 1):
+            return
+        best[state] = g
+        if h == MatchingHeuristic.INFINITY:
+            return  # proven unsolvable
+        f = g + h
+        if f < incumbent.value:
+            frontier.push(f, h, (f, g, path, state))
+
+    def receive(batch):
+        idle[me] = 0
+        received[me] += len(batch)
+        for player, boxes, key, g, path in batch:
+            state = SokobanPuzzle.from_positions(level, player, boxes, key)
+            if g < best.get(state, g + 1):
+                insert(state, g, heuristic.evaluate(state), path)
+
+    if root.key % workers == me:
+        insert(root, 0, heuristic.evaluate(root), b'')
+
+    while not stop.is_set():
+        while True:
+            try:
+                receive(inbox.get_nowait())
+            except queue.Empty:
+                break
+
+        if not frontier:
+            for owner in range(workers):
+                flush(owner)
+            idle[me] = 1
+            try:
+                receive(inbox.get(timeout=0.01))
+            except queue.Empty:
+                pass
+            continue
+
+        # expand a slice of nodes before looking at the inbox again
+        for _ in range(batch_size):
+            if not frontier:
+                break
+            f, g, path, state = frontier.pop()
+            if g > best[state] or f >= incumbent.value:
+                continue  # stale entry, or cannot beat the incumbent
+            expanded += 1
+            child_g = g + 1
+            parent_h = f - g
+            for action, child in search.successors(state, push_moves):
+                generated += 1
+                if child_g >= incumbent.value:
+                    break
+                child_path = path + bytes((encode(state, action),))
+                if child.isGoal():
+                    with incumbent.get_lock():
+                        if child_g < incumbent.value:
+                            incumbent.value = child_g
+                            results.put(('solution', child_g, child_path))
+                    continue
+                owner = child.key % workers
+                if owner == me:
+                    h = search.child_heuristic(heuristic, state, parent_h, action, child)
+                    insert(child, child_g, h, child_path)
+                else:
+                    outbox[owner].append((child.player, child.boxes, child.key, child_g, child_path))
+                    if len(outbox[owner]) >= batch_size:
+                        flush(owner)
+        for owner in range(workers):
+            flush(owner)
+        progress[me] = expanded
+
+    results.put(('stats', me, expanded, generated))
+    # undelivered batches must not keep the process alive at exit
+    for other in inboxes:
+        other.cancel_join_thread()
+
+
+class ParallelSearch:
+    """
+    Hash-distributed A* (HDA*) over several processes. Every state has an
+    owner, the worker given by its Zobrist key modulo the worker count;
+    only the owner keeps it in its open and closed lists, so duplicate
+    detection stays local. Successors owned by another worker are sent to
+    it in batches through multiprocessing queues.
+
+    Workers share the cost of the best solution found so far and drop
+    every node that cannot beat it. The search ends once every worker is
+    idle (its open list is empty) and every sent successor has been
+    received, seen the same way in two consecutive checks; with an
+    admissible heuristic the remaining incumbent is then optimal.
+    Moves, deadlock pruning and heuristics come from SokobanPuzzle and
+    Search, one Search per worker.
+
+    The node and time limits and the cancellation token are checked by the
+    parent process between termination checks; the memory limit is not
+    used, as memory is spread over the workers.
+    """
+    def __init__(self, workers=None, batch_size=64, limits=None, cancel=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.limits = limits if limits is not None else Limits()
+        self.cancel = cancel
+        # per-worker counters and SearchResult of the last run; when a limit
+        # stops the search, result.node is the best unproven solution
+        self.expanded = []
+        self.generated = []
+        self.result = None
+
+    def hda_star(self, initial_state, heuristic_type, push_moves=False):
+        """Parallel A*; returns a solution node like Search.astar, or None."""
+        workers = self.workers
+        self.expanded = [0] * workers
+        self.generated = [0] * workers
+        started = time.monotonic()
+        time_limit = self.limits.time_limit
+        deadline = None if time_limit is None else started + time_limit
+        if Search().is_deadlocked(initial_state):
+            self.result = SearchResult(UNSOLVABLE, None, 0, 0, time.monotonic() - started)
+            return None
+        nodes = NodeTable(initial_state, push_moves)
+        if initial_state.isGoal():
+            node = nodes.node(nodes.add(initial_state), initial_state)
+            self.result = SearchResult(SOLVED, node, 0, 0, time.monotonic() - started)
+            return node
+
+        context = multiprocessing.get_context()
+        inboxes = [context.Queue() for _ in range(workers)]
+        results = context.Queue()
+        incumbent = context.Value('q', 2 ** 62)
+        sent = context.Array('q', workers, lock=False)
+        received = context.Array('q', workers, lock=False)
+        idle = context.Array('b', workers, lock=False)
+        progress = context.Array('q', workers, lock=False)
+        stop = context.Event()
+        processes = [
+            context.Process(
+                target=_hda_worker,
+                args=(me, workers, initial_state.level, initial_state, heuristic_type,
+                      push_moves, self.batch_size, inboxes, results, incumbent,
+                      sent, received, idle, progress, stop),
+                daemon=True)
+            for me in range(workers)
+        ]
+        for process in processes:
+            process.start()
+
+        solution = None  # (cost, path)
+        status = None
+        last_wave = None
+        try:
+            while True:
+                try:
+                    message = results.get(timeout=0.02)
+                    if message[0] == 'solution' and (solution is None or message[1] < solution[0]):
+                        solution = message[1:]
+                    continue
+                except queue.Empty:
+                    pass
+                for process in processes:
+                    if process.exitcode not in (None, 0):
+                        raise RuntimeError(f"HDA* worker exited with code {process.exitcode}")
+                # termination wave: all idle and no successor in flight,
+                # with nothing changed since the previous wave
+                wave = (sum(sent), sum(received), all(idle))
+                if wave[2] and wave[0] == wave[1] and wave == last_wave:
+                    break
+                last_wave = wave
+                status = self._stopped(deadline, sum(progress))
+                if status is not None:
+                    break
+        finally:
+            stop.set()
+            reported = 0
+            while reported < workers:
+                try:
+                    message = results.get(timeout=0.1)
+                except queue.Empty:
+                    if not any(process.is_alive() for process in processes):
+                        break
+                    continue
+                if message[0] == 'stats':
+                    _, me, expanded, generated = message
+                    self.expanded[me] = expanded
+                    self.generated[me] = generated
+                    reported += 1
+                elif solution is None or message[1] < solution[0]:
+                    solution = message[1:]
+            for process in processes:
+                process.join()
+
+        node = None if solution is None else nodes.follow(solution[1])
+        if status is None:
+            status = SOLVED if node is not None else UNSOLVABLE
+        self.result = SearchResult(status, node, sum(self.expanded), sum(self.generated),
+                                   time.monotonic() - started)
+        return node if status == SOLVED else None
+
+    def _stopped(self, deadline, expanded):
+        #Status of the limit that stops the search now, or None
+        if self.cancel is not None and self.cancel.cancelled:
+            return CANCELLED
+        if deadline is not None and time.monotonic() >= deadline:
+            return TIME_LIMIT
+        if self.limits.max_nodes is not None and expanded >= self.limits.max_nodes:
+            return NODE_LIMIT
+        return None
+
+
+def _portfolio_worker(strategy, initial_state, push_moves, limits, results):
+    #Run one strategy and report (strategy, status, cost, step actions,
+    #seconds, error, expanded); actions are None when there is no solution
+    start = time.monotonic()
+    search = Search(limits=limits)
+    try:
+        node = search.solve(initial_state, strategy, push_moves)
+    except Exception as e:
+        results.put((strategy, None, None, None, time.monotonic() - start, repr(e), search.expanded))
+        return
+    status = search.result.status if search.result is not None else None
+    actions = None if node is None else node.getSolution()
+    cost = None if node is None else node.g
+    results.put((strategy, status, cost, actions, time.monotonic() - start, None, search.expanded))
+
+
+def _step_node(initial_state, actions):
+    #Solution node over step moves, rebuilt by replaying actions
+    nodes = NodeTable(initial_state)
+    index = nodes.add(initial_state)
+    state = initial_state
+    for g, action in enumerate(actions, 1):
+        child = state.move(action)
+        index = nodes.add(child, index, state, action, g)
+        state = child
+    return nodes.node(index, state)
+
+
+class Portfolio:
+    """
+    Races several search strategies (Search.solve names such as "bfs" or
+    "astar:h2") on the same level, one process each, and keeps the first
+    solution. With require_optimal only strategies that prove optimality
+    (Search.is_optimal) can win, unless none of them finds a solution.
+    A solution of a strategy stopped by a limit (the incumbent of an
+    anytime search) only wins when no other strategy solves the level, and
+    result.status is then that strategy's limit status.
+    The losers are terminated as soon as there is a winner.
+
+    limits.time_limit and the cancellation token apply to the whole race,
+    the node and memory limits to every strategy on its own.
+    The winning strategy of every solve is counted in wins and, with a
+    log_path, appended as one JSON line, so the portfolio can be tuned
+    from the record.
+    A strategy that raises is logged on this module's logger; when no
+    strategy gets to an answer because they all failed, result.status is
+    ERROR rather than UNSOLVABLE.
+    """
+    DEFAULT_STRATEGIES = ("bfs", "astar:h1", "astar:h2", "astar:h3", "astar:hm")
+
+    def __init__(self, strategies=DEFAULT_STRATEGIES, push_moves=False,
+                 require_optimal=False, limits=None, cancel=None, log_path=None):
+        self.strategies = tuple(strategies)
+        self.push_moves = push_moves
+        self.require_optimal = require_optimal
+        self.limits = limits if limits is not None else Limits()
+        self.cancel = cancel
+        self.log_path = log_path
+        self.wins = Counter()
+        # outcome of the last solve; result.expanded counts the winner only
+        self.winner = None
+        self.cost = None
+        self.seconds = None
+        self.result = None
+
+    def solve(self, initial_state):
+        """Solution node of the winning strategy (step moves), or None."""
+        self.winner = self.cost = self.seconds = None
+        start = time.monotonic()
+        time_limit = self.limits.time_limit
+        deadline = None if time_limit is None else start + time_limit
+        # the race deadline is enforced here, the rest in every strategy
+        strategy_limits = self.limits._replace(time_limit=None)
+        context = multiprocessing.get_context()
+        results = context.Queue()
+        processes = {
+            strategy: context.Process(target=_portfolio_worker,
+                                      args=(strategy, initial_state, self.push_moves,
+                                            strategy_limits, results),
+                                      daemon=True)
+            for strategy in self.strategies
+        }
+        for process in processes.values():
+            process.start()
+
+        fallback = None  # first solution of a strategy that does not prove optimality
+        winner = None
+        status = UNSOLVABLE
+        proved = False  # a strategy searched the whole space without a solution
+        pending = len(processes)
+        try:
+            while pending and winner is None:
+                if self.cancel is not None and self.cancel.cancelled:
+                    status = CANCELLED
+                    break
+                timeout = 0.1 if deadline is None else max(0.0, min(0.1, deadline - time.monotonic()))
+                try:
+                    result = results.get(timeout=timeout)
+                except queue.Empty:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        status = TIME_LIMIT
+                        break
+                    if not any(process.is_alive() for process in processes.values()) and results.empty():
+                        break  # a worker died without reporting
+                    continue
+                pending -= 1
+                strategy, strategy_status, cost, actions, seconds, error, expanded = result
+                if error is not None:
+                    logger.error("Portfolio strategy %s failed: %s", strategy, error)
+                if strategy_status == UNSOLVABLE:
+                    proved = True
+                if strategy_status in LIMIT_STATUSES:
+                    status = strategy_status
+                if actions is None:
+                    continue
+                # an anytime incumbent cut short by a limit is only a fallback
+                if strategy_status != SOLVED or (self.require_optimal and not Search.is_optimal(strategy)):
+                    if fallback is None:
+                        fallback = result
+                    continue
+                winner = result
+        finally:
+            for process in processes.values():
+                if process.is_alive():
+                    process.terminate()
+            for process in processes.values():
+                process.join()
+
+        if winner is None:
+            winner = fallback
+        if winner is None:
+            if status == UNSOLVABLE and not proved:
+                # every strategy failed or died without an answer
+                status = ERROR
+            self.result = SearchResult(status, None, 0, 0, time.monotonic() - start)
+            return None
+        strategy, strategy_status, cost, actions, seconds, _, expanded = winner
+        self.winner = strategy
+        self.cost = cost
+        self.seconds = time.monotonic() - start
+        self.wins[strategy] += 1
+        if self.log_path is not None:
+            self._log(initial_state, winner)
+        node = _step_node(initial_state, actions)
+        self.result = SearchResult(strategy_status, node, expanded, 0, self.seconds)
+        return node
+
+    def _log(self, initial_state, winner):
+        strategy, status, cost, actions, seconds, _, expanded = winner
+        record = {
+            "level": format(initial_state.key, "016x"),
+            "winner": strategy,
+            "optimal": status == SOLVED and Search.is_optimal(strategy),
+            "cost": cost,
+            "steps": len(actions),
+            "expanded": expanded,
+            "seconds": round(seconds, 4),
+            "strategies": list(self.strategies),
+            "push_moves": self.push_moves,
+        }
+        with open(self.log_path, "a") as log:
+            log.write(json.dumps(record) + "\n")
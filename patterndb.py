@@ -0,0 +1,123 @@
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from collections import deque
+from sokoban import SokobanPuzzle
+
+
+class PatternDatabase:
+    """
+    Exact push costs of every placement of `size` boxes on one wall layout:
+    the fewest pushes that bring those boxes onto any `size` distinct
+    targets, with no other box on the board. Built by a backward pull BFS
+    from every goal placement (SokobanPuzzle.goalStates), keeping for each
+    box placement the cost from its best player region, so a lookup never
+    overestimates whatever the player's position.
+
+    Boxes are numbered over the live cells of the layout (floor that is not
+    a dead square) and a sorted placement (i1 < i2 < ...) is stored at
+    i1*L^(size-1) + i2*L^(size-2) + ..., one byte per entry, UNSOLVABLE for
+    placements that cannot be solved even alone. The table is written to a
+    file named after a hash of the layout and memory-mapped read-only, so
+    it is built once per layout and its pages are shared by every process
+    that maps it.
+    """
+    MAGIC = b'SKPD'
+    HEADER = struct.Struct('<4sBxH')  # magic, size, live cell count
+    UNSOLVABLE = 0xFF
+    DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".sokoban_pdb")
+    # mapped databases of this process, by (layout key, size, directory)
+    cache = {}
+
+    def __init__(self, path, live_cells):
+        self.path = path
+        self.live_cells = live_cells
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        _, self.size, count = self.HEADER.unpack_from(self.map)
+        # database index of every cell, -1 for walls and dead squares
+        self.index = {cell: i for i, cell in enumerate(live_cells)}
+        self.strides = [count ** (self.size - 1 - j) for j in range(self.size)]
+
+    @classmethod
+    def for_level(cls, level, size=2, directory=None):
+        """Database of level's layout, loaded from disk or built on first use."""
+        directory = directory or cls.DEFAULT_DIRECTORY
+        layout = level.layout_key()
+        database = cls.cache.get((layout, size, directory))
+        if database is None:
+            live_cells = [cell for cell in range(level.width * level.height)
+                          if not level.wall_mask[cell] and not level.dead_mask[cell]]
+            digest = hashlib.sha256(repr(layout).encode("utf-8")).hexdigest()[:32]
+            path = os.path.join(directory, "%s-%d.pdb" % (digest, size))
+            if not cls._valid(path, size, len(live_cells)):
+                cls.build(level, size, live_cells, path)
+            database = cls(path, live_cells)
+            cls.cache[(layout, size, directory)] = database
+        return database
+
+    @classmethod
+    def _valid(cls, path, size, count):
+        #True if path holds a complete database of this shape
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(cls.HEADER.size)
+                length = os.fstat(f.fileno()).st_size
+        except OSError:
+            return False
+        if len(header) < cls.HEADER.size:
+            return False
+        return (cls.HEADER.unpack(header) == (cls.MAGIC, size, count)
+                and length == cls.HEADER.size + count ** size)
+
+    @classmethod
+    def build(cls, level, size, live_cells, path):
+        """Compute the database of level's layout and write it to path."""
+        count = len(live_cells)
+        index = {cell: i for i, cell in enumerate(live_cells)}
+        strides = [count ** (size - 1 - j) for j in range(size)]
+        table = bytearray([cls.UNSOLVABLE]) * (count ** size)
+        queue = deque()
+        seen = set()
+        for state in SokobanPuzzle.goalStates(level, size):
+            seen.add((state.player, state.boxes))
+            queue.append((state, 0))
+        while queue:
+            state, cost = queue.popleft()
+            slot = sum(index[box] * stride for box, stride in zip(state.boxes, strides))
+            if cost < table[slot]:
+                table[slot] = min(cost, cls.UNSOLVABLE - 1)
+            for _, predecessor in state.pullSuccessorFunction():
+                position = (predecessor.player, predecessor.boxes)
+                if position not in seen:
+                    seen.add(position)
+                    queue.append((predecessor, cost + 1))
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # write to a temporary file and rename, so a process building the
+        # same layout at the same time never sees a partial file
+        fd, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, 'wb') as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, size, count))
+            f.write(table)
+        os.replace(temporary, path)
+
+    def cost(self, boxes):
+        """Pushes that the sorted box cells need alone, UNSOLVABLE if they cannot be solved.
+
+        Boxes on dead squares are UNSOLVABLE as well.
+        """
+        slot = self.HEADER.size
+        for box, stride in zip(boxes, self.strides):
+            i = self.index.get(box)
+            if i is None:
+                return self.UNSOLVABLE
+            slot += i * stride
+        return self.map[slot]
+
+    def close(self):
+        self.map.close()
+        self.file.close()
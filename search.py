@@ -1,193 +1,708 @@
-from collections import deque #for fifo
+from array import array
 import heapq #priority queue a*
-from node import Node #all states in
+import time
+from node import Node, NodeSet, NodeTable #all states in
+from sokoban import Board, SokobanPuzzle
+from deadlock import DeadlockPipeline
+from external import ExternalBFS
+from limits import (CANCELLED, MEMORY_LIMIT, NODE_LIMIT, SOLVED, TIME_LIMIT, UNSOLVABLE,
+                    Limits, SearchResult, SearchStopped, memory_usage, stoppable)
+from heuristics import (Heuristic, MatchingHeuristic, MisplacedBoxes, Move,
+                        NearestTargetDistance, PatternDatabaseHeuristic, PlayerBoxDistance)
+from openlist import OPEN_LISTS
+from stats import StatsCollector
+
+class TranspositionTable:
+    """
+    Fixed-size transposition table for IDA*: remembers the smallest g at
+    which a position was reached during the current iteration. A position
+    reached again with a g at least as large has already been searched with
+    a larger budget, so it is cut. Slots are indexed by the low bits of the
+    64-bit Zobrist key, which is also what identifies the entry.
+    Replacement: an entry from an older iteration is always overwritten, an
+    entry of the current iteration only by a smaller g (entries near the
+    root cut the biggest subtrees).
+    """
+    def __init__(self, size=1 << 20):
+        # round down to a power of two so the slot is key & mask
+        size = 1 << max(size.bit_length() - 1, 0)
+        self.mask = size - 1
+        self.keys = array('Q', [0]) * size
+        self.g = array('i', [0]) * size
+        self.iteration = array('i', [0]) * size
+        self.current = 1
+        self.cuts = 0
+
+    def new_iteration(self):
+        self.current += 1
+
+    def visit(self, key, g):
+        """False if key was already searched at g or less this iteration."""
+        slot = key & self.mask
+        if self.iteration[slot] == self.current:
+            if self.keys[slot] == key:
+                if self.g[slot] <= g:
+                    self.cuts += 1
+                    return False
+            elif self.g[slot] <= g:
+                return True  # keep the entry closer to the root
+        self.keys[slot] = key
+        self.g[slot] = g
+        self.iteration[slot] = self.current
+        return True
+
 
 class Search:
-    def __init__(self):
-        pass
+    # heuristics that never overestimate the remaining cost; h3 adds the
+    # player's walk to a box, which can
+    ADMISSIBLE = ("h0", "h1", "h2", "hm", "hp")
+
+    def __init__(self, deadlocks=None, check_heuristics=False, open_list="bucket",
+                 limits=None, cancel=None, cache=None, stats=False):
+        # Dynamic deadlock detectors run on every generated push;
+        # pass DeadlockPipeline([]) to turn them off
+        self.deadlocks = deadlocks if deadlocks is not None else DeadlockPipeline()
+        self.matching = MatchingHeuristic()
+        self.zero_heuristic = Heuristic()
+        self.heuristics = {
+            "h1": MisplacedBoxes(),
+            "h2": NearestTargetDistance(),
+            "h3": PlayerBoxDistance(),
+            "hm": self.matching,
+            # pattern databases of box pairs, built or mapped on first use
+            "hp": PatternDatabaseHeuristic(),
+        }
+        # Debug mode: every incremental heuristic value is checked against
+        # a full evaluation of the same state
+        self.check_heuristics = check_heuristics
+        # Open list of astar: "bucket" (default) or "heap", see openlist.py
+        self.open_list = OPEN_LISTS[open_list]
+        # Limits and CancellationToken checked by every search (see limits.py)
+        self.limits = limits if limits is not None else Limits()
+        self.cancel = cancel
+        # Optional SolutionCache consulted by solve
+        self.cache = cache
+        # With stats, every search fills a SearchStats (see stats.py)
+        self.collector = None
+        # Counters and SearchResult of the last search run
+        self.expanded = 0
+        self.generated = 0
+        self.pruned = 0  # children a heuristic proved unsolvable
+        self.board_moves = 0  # IDA* successors, made in place on its Board
+        self.result = None
+        self.stats = None
+        self.started = None
+        self.deadline = None
+        self.next_check = None
+        # Frontier, closed sets and transposition table of the running
+        # search, registered for its SearchStats
+        self._frontier = None
+        self._closed = None
+        self._table = None
+        if stats:
+            # last, so that searches without stats have no instrumentation
+            # at all and the hot paths keep their plain methods
+            self.collector = StatsCollector(self)
+
+    def start(self):
+        """Reset the counters and start the clock of a new search."""
+        self.expanded = 0
+        self.generated = 0
+        self.pruned = 0
+        self.board_moves = 0
+        self.result = None
+        self.started = time.monotonic()
+        time_limit = self.limits.time_limit
+        self.deadline = None if time_limit is None else self.started + time_limit
+        self.next_check = self._next_check()
+        self.stats = None
+        if self.collector is not None:
+            self.stats = self.collector.start()
+
+    def _next_check(self):
+        next_check = self.expanded + self.limits.check_every
+        if self.limits.max_nodes is not None:
+            # the node limit is exact
+            next_check = min(next_check, self.limits.max_nodes)
+        return next_check
+
+    def expand(self):
+        """Count one expansion; the limits are checked every check_every calls."""
+        if self.expanded >= self.next_check:
+            self.check_limits()
+        self.expanded += 1
+
+    def check_limits(self):
+        """Raise SearchStopped if a limit is reached or the search was cancelled."""
+        limits = self.limits
+        if limits.max_nodes is not None and self.expanded >= limits.max_nodes:
+            raise SearchStopped(NODE_LIMIT)
+        if self.cancel is not None and self.cancel.cancelled:
+            raise SearchStopped(CANCELLED)
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise SearchStopped(TIME_LIMIT)
+        if limits.max_memory is not None:
+            usage = memory_usage()
+            if usage is not None and usage >= limits.max_memory:
+                raise SearchStopped(MEMORY_LIMIT)
+        self.next_check = self._next_check()
+
+    def finish(self, status, node):
+        """Record the SearchResult of the search that just ended."""
+        seconds = time.monotonic() - self.started
+        if self.collector is not None:
+            self.collector.finish(seconds)
+        self.result = SearchResult(status, node, self.expanded, self.generated, seconds, self.stats)
+        self._frontier = self._closed = self._table = None
 
     def is_deadlocked(self, state):
-        """Check for deadlocks in the current state."""
-        # Get the positions of all boxes and storage points
-        boxes = []
-        storage_points = []
-        
-        for i in range(len(state.grid)):
-            for j in range(len(state.grid[0])):
-                if state.grid[i][j] == 'B':
-                    boxes.append((i, j))
-                elif state.grid[i][j] == 'S':
-                    storage_points.append((i, j))
-        
-        # If there are no boxes or storage points, can't be deadlocked
-        if not boxes or not storage_points:
-            return False
-
-        # Check each box position against storage points to see if they can reach any
-        for box in boxes:
-            if not self.can_reach_storage(box, storage_points, state):
+        """Check for deadlocks: a box off storage on a precomputed dead square."""
+        dead_mask = state.level.dead_mask
+        for box in state.boxes:
+            if dead_mask[box]:
                 return True
-        
         return False
 
-    def can_reach_storage(self, box, storage_points, state):
-        """Use BFS to check if the box can reach any storage point."""
-        # BFS to see if the box can reach a storage point
-        queue = deque([box])
-        visited = set()
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]  # Up, Down, Left, Right
+    def successors(self, state, push_moves=False):
+        """Step successors, or one successor per box push when push_moves is set."""
+        if push_moves:
+            return state.pushSuccessorFunction(self.deadlocks)
+        return state.successorFunction(self.deadlocks)
+
+    def predecessors(self, state):
+        """Pull successors of state, for searching backwards from the goal."""
+        return state.pullSuccessorFunction()
+
+    @stoppable
+    def BFS(self, initial_state, push_moves=False):
+        """Breadth-First Search implementation for Sokoban puzzle.
+
+        With push_moves the search runs over box pushes (g counts pushes);
+        the goal node still expands back to step actions via getSolution.
+        """
+        # Successors pushing a box onto a dead square (or into a deadlock
+        # found by the pipeline) are never generated, so only the initial
+        # state needs the deadlock check
+        if self.is_deadlocked(initial_state):
+            return None
         
-        while queue:
-            current = queue.popleft()
-            if current in visited:
-                continue
-            visited.add(current)
+        # Nodes live in a compact table, and states are rebuilt from it
+        # when they are expanded
+        nodes = NodeTable(initial_state, push_moves)
+        root = nodes.add(initial_state)
+        if initial_state.isGoal():
+            return nodes.node(root, initial_state)
+        
+        # One set for everything ever generated: a state is queued at most
+        # once, and since every edge costs 1 the first time it is generated
+        # is also the shallowest
+        seen = NodeSet(nodes)
+        seen.add(initial_state, root)
+        self._closed = (seen,)
+        
+        # Rows are added in breadth-first order, so the frontier is simply
+        # the rows from current_index to rows
+        current_index = 0
+        rows = 1
+        while current_index < rows:
+            current_state = nodes.state(current_index)
+            self.expand()
+            g = nodes.g[current_index] + 1
+            for action, successor_state in self.successors(current_state, push_moves):
+                # the state is claimed for the row added next
+                if not seen.add(successor_state, rows):
+                    continue
+                successor_index = nodes.add(successor_state, current_index, current_state, action, g)
+                rows += 1
+                self.generated += 1
+                # goal test on generation saves expanding the whole last layer
+                if successor_state.isGoal():
+                    return nodes.node(successor_index, successor_state)
+            current_index += 1
+        
+        return None
 
-            # Check if this position is a storage point
-            if current in storage_points:
-                return True
-            
-            # Check possible moves
-            for d in directions:
-                next_pos = (current[0] + d[0], current[1] + d[1])
-                # Ensure the move is within bounds and not a wall
-                if (0 <= next_pos[0] < len(state.grid) and
-                    0 <= next_pos[1] < len(state.grid[0]) and
-                    state.grid[next_pos[0]][next_pos[1]] != '#'):  # Assuming '#' represents walls
-                    queue.append(next_pos)
+    @stoppable
+    def external_BFS(self, initial_state, push_moves=False, memory_limit=64 << 20, directory=None):
+        """Breadth-first search with its frontier and closed set on disk.
 
-        return False
+        At most about memory_limit bytes of successors are held in memory
+        before they are spilled to sorted files under directory (the system
+        temporary directory by default); see ExternalBFS.
+        """
+        return ExternalBFS(self, memory_limit, directory).solve(initial_state, push_moves)
+
+    @stoppable
+    def BFS_length(self, initial_state, push_moves=False):
+        """Length of the shortest solution (steps, or pushes with push_moves).
+
+        Layer-synchronous breadth-first search that keeps no parent data:
+        only the current layer and the seen set are alive, so each layer's
+        states are dropped once the next one is built. Returns None when
+        there is no solution.
+        """
+        if self.is_deadlocked(initial_state):
+            return None
+        if initial_state.isGoal():
+            return 0
+        
+        seen = {initial_state}
+        self._closed = (seen,)
+        layer = [initial_state]
+        depth = 0
+        while layer:
+            depth += 1
+            next_layer = []
+            for state in layer:
+                self.expand()
+                for _, successor_state in self.successors(state, push_moves):
+                    if successor_state in seen:
+                        continue
+                    if successor_state.isGoal():
+                        return depth
+                    seen.add(successor_state)
+                    self.generated += 1
+                    next_layer.append(successor_state)
+            layer = next_layer
+        
+        return None
 
-    def BFS(self, initial_state):
-        """Breadth-First Search implementation for Sokoban puzzle."""
-        initial_node = Node(initial_state)
-        frontier = deque([initial_node])
-        explored = set()
+    @stoppable
+    def astar(self, initial_state, heuristic_type, push_moves=False):
+        """A* search implementation (see BFS for push_moves)."""
+        if self.is_deadlocked(initial_state):
+            return None
+        
+        heuristic = self.heuristic(heuristic_type)
+        nodes = NodeTable(initial_state, push_moves)
+        explored = NodeSet(nodes)
+        h = heuristic.evaluate(initial_state)
+        if h == MatchingHeuristic.INFINITY:
+            return None
+        # open list entries are node indexes, keyed on f and h; states are
+        # rebuilt from the table when they are popped
+        frontier = self.open_list()
+        frontier.push(h, h, nodes.add(initial_state, h=h))
+        self._frontier, self._closed = frontier, (explored,)
         
         while frontier:
-            current_node = frontier.popleft()
-            current_state = current_node.state
-            
-            # Check for deadlock before proceeding
-            if self.is_deadlocked(current_state):
-                print("Deadlock detected!")
-                return None
+            current_index = frontier.pop()
+            current_state = nodes.state(current_index)
             
-            # Check if current state is goal state
             if current_state.isGoal():
-                return current_node
+                return nodes.node(current_index, current_state)
             
-            grid_tuple = tuple(tuple(row) for row in current_state.grid)
-            if grid_tuple in explored:
+            if not explored.add(current_state, current_index):
                 continue
-                
-            explored.add(grid_tuple)
             
-            for action, successor_state in current_state.successorFunction():
-                successor_node = Node(successor_state, current_node, action, current_node.g + 1)
-                successor_grid_tuple = tuple(tuple(row) for row in successor_state.grid)
-                
-                if successor_grid_tuple not in explored:
-                    frontier.append(successor_node)
+            self.expand()
+            
+            g = nodes.g[current_index] + 1
+            parent_h = nodes.h[current_index]
+            for action, successor_state in self.successors(current_state, push_moves):
+                if successor_state not in explored:
+                    h = self.child_heuristic(heuristic, current_state, parent_h, action, successor_state)
+                    if h == MatchingHeuristic.INFINITY:
+                        self.pruned += 1
+                        continue  # proven unsolvable
+                    child_index = nodes.add(successor_state, current_index, current_state, action, g, h)
+                    self.generated += 1
+                    frontier.push(g + h, h, child_index)
         
         return None
 
-    def astar(self, initial_state, heuristic_type):
-        """A* search implementation."""
-        frontier = []
-        explored = set()
+    def anytime_astar(self, initial_state, heuristic_type, push_moves=False,
+                      weights=(5, 3, 2, 1.5, 1.25, 1), time_limit=None, max_nodes=None):
+        """Anytime weighted A*: a generator of (solution node, bound) pairs.
+
+        Starts with f = g + w * h for the first weight and yields a solution
+        as soon as one is found, then keeps searching for cheaper ones while
+        the weight is tightened. Open and closed lists are reused from one
+        weight to the next (states improved after being closed are re-queued),
+        and nodes that cannot beat the current solution are dropped.
+        bound is the proven suboptimality ratio cost / lower bound (1.0 means
+        optimal); it is only meaningful for admissible heuristics.
+        Stops when the last weight is exhausted, after time_limit seconds or
+        after max_nodes expansions, or on the Search limits; search.result
+        then holds the last solution with the reason it stopped.
+        """
+        self.start()
+        solution = None
+        try:
+            for solution, bound in self._anytime(initial_state, heuristic_type, push_moves,
+                                                 weights, time_limit, max_nodes):
+                yield solution, bound
+        except SearchStopped as stop:
+            self.finish(stop.status, solution)
+            return
+        self.finish(SOLVED if solution is not None else UNSOLVABLE, solution)
+
+    def _anytime(self, initial_state, heuristic_type, push_moves, weights, time_limit, max_nodes):
+        if self.is_deadlocked(initial_state):
+            return
         
-        initial_node = Node(initial_state)
-        initial_node.heuristic = self.calculate_heuristic(initial_state, heuristic_type)
-        initial_node.setF()
-        heapq.heappush(frontier, (initial_node.f, id(initial_node), initial_node))
+        deadline = None if time_limit is None else time.monotonic() + time_limit
+        heuristic = self.heuristic(heuristic_type)
+        nodes = NodeTable(initial_state, push_moves)
+        h = heuristic.evaluate(initial_state)
+        # best known node index of every generated state
+        best = {initial_state: nodes.add(initial_state, h=h)}
+        open_states = {initial_state}
+        inconsistent = set()
+        self._closed = (best,)
+        incumbent = None  # (cost, node index, state)
+        last_bound = None
         
-        while frontier:
-            _, _, current_node = heapq.heappop(frontier)
-            current_state = current_node.state
+        for weight in weights:
+            # re-key the open list (plus re-opened states) for the new weight
+            open_states |= inconsistent
+            inconsistent = set()
+            frontier = [(nodes.g[best[state]] + weight * nodes.h[best[state]], best[state], state)
+                        for state in open_states]
+            heapq.heapify(frontier)
+            self._frontier = frontier
+            closed = set()
             
-            # Check for deadlock before proceeding
-            if self.is_deadlocked(current_state):
-                print("Deadlock detected!")
-                return None
+            while frontier:
+                if max_nodes is not None and self.expanded >= max_nodes:
+                    raise SearchStopped(NODE_LIMIT)
+                if deadline is not None and time.monotonic() > deadline:
+                    raise SearchStopped(TIME_LIMIT)
+                _, index, state = heapq.heappop(frontier)
+                if best.get(state) != index or state not in open_states:
+                    continue  # stale entry
+                open_states.discard(state)
+                g = nodes.g[index]
+                if incumbent is not None and g + nodes.h[index] >= incumbent[0]:
+                    continue  # cannot lead to a cheaper solution
+                
+                if state.isGoal():
+                    incumbent = (g, index, state)
+                    last_bound = self._anytime_bound(nodes, best, incumbent, open_states | inconsistent, weight)
+                    yield nodes.node(index, state), last_bound
+                    continue
+                
+                closed.add(state)
+                self.expand()
+                child_g = g + 1
+                for action, successor in self.successors(state, push_moves):
+                    known = best.get(successor)
+                    if known is not None and nodes.g[known] <= child_g:
+                        continue
+                    child_h = self.child_heuristic(heuristic, state, nodes.h[index], action, successor)
+                    child_index = nodes.add(successor, index, state, action, child_g, child_h)
+                    self.generated += 1
+                    best[successor] = child_index
+                    if successor in closed:
+                        inconsistent.add(successor)
+                    else:
+                        open_states.add(successor)
+                        heapq.heappush(frontier, (child_g + weight * child_h, child_index, successor))
+        
+        if incumbent is not None and last_bound != 1.0:
+            # every weight exhausted: the last solution is now proven optimal
+            yield nodes.node(incumbent[1], incumbent[2]), 1.0
+
+    def _anytime_bound(self, nodes, best, incumbent, pending, weight):
+        # cost / smallest g + h still pending, capped by the weight in use
+        lower = incumbent[0]
+        for state in pending:
+            index = best[state]
+            lower = min(lower, nodes.g[index] + nodes.h[index])
+        if lower <= 0:
+            return float(weight)
+        return min(float(weight), incumbent[0] / lower)
+
+    @stoppable
+    def bidirectional(self, initial_state):
+        """Bidirectional breadth-first search over box pushes.
+
+        The forward side pushes boxes from the initial state; the backward
+        side pulls boxes starting from every goal position (all boxes on
+        targets, the player in any free region). Both use states normalized
+        to the player's region, so they meet on equal states. Whole layers
+        are expanded, smaller frontier first, and the best meeting of the
+        layer is kept, so the solution has the fewest pushes. It is returned
+        as a Node chain of Push moves (getSolution expands it to steps).
+        """
+        if self.is_deadlocked(initial_state):
+            return None
+        if initial_state.isGoal():
+            return Node(initial_state)
+        
+        level = initial_state.level
+        # parents[state] = (parent state, Push); for the backward side the
+        # Push is the forward move from state to its parent
+        forward = {initial_state: None}
+        backward = {goal: None for goal in SokobanPuzzle.goalStates(level, len(initial_state.boxes))}
+        forward_depth = {initial_state: 0}
+        backward_depth = dict.fromkeys(backward, 0)
+        forward_frontier = [initial_state]
+        backward_frontier = list(backward)
+        self._closed = (forward, backward)
+        
+        while forward_frontier and backward_frontier:
+            expand_forward = len(forward_frontier) <= len(backward_frontier)
+            if expand_forward:
+                frontier, parents, depth = forward_frontier, forward, forward_depth
+                other, other_depth = backward, backward_depth
+            else:
+                frontier, parents, depth = backward_frontier, backward, backward_depth
+                other, other_depth = forward, forward_depth
             
-            if current_state.isGoal():
-                return current_node
+            next_frontier = []
+            best = None
+            for state in frontier:
+                self.expand()
+                if expand_forward:
+                    successors = self.successors(state, True)
+                else:
+                    successors = self.predecessors(state)
+                for push, successor in successors:
+                    if successor in parents:
+                        continue
+                    parents[successor] = (state, push)
+                    self.generated += 1
+                    depth[successor] = depth[state] + 1
+                    next_frontier.append(successor)
+                    if successor in other:
+                        total = depth[successor] + other_depth[successor]
+                        if best is None or total < best[0]:
+                            best = (total, successor)
+            if best is not None:
+                return self._splice(initial_state, best[1], forward, backward)
             
-            grid_tuple = tuple(tuple(row) for row in current_state.grid)
-            if grid_tuple in explored:
+            if expand_forward:
+                forward_frontier = next_frontier
+            else:
+                backward_frontier = next_frontier
+        
+        return None
+
+    def _splice(self, initial_state, meeting, forward, backward):
+        # Forward half: pushes from the initial state to the meeting state
+        pushes = []
+        state = meeting
+        while forward[state] is not None:
+            state, push = forward[state]
+            pushes.append(push)
+        pushes.reverse()
+        # Backward half: the stored pushes already lead towards the goal
+        state = meeting
+        while backward[state] is not None:
+            state, push = backward[state]
+            pushes.append(push)
+        
+        node = Node(initial_state)
+        for push in pushes:
+            node = Node(node.state.applyPush(push), node, push, node.g + 1)
+        return node
+
+    @stoppable
+    def ida_star(self, initial_state, heuristic_type, table_size=1 << 20):
+        """IDA* search: memory linear in the solution depth.
+
+        Moves are made and unmade in place on a single Board. table_size
+        sets the number of transposition table slots (0 turns it off).
+        Returns a Node chain like the other searches, or None.
+        """
+        if self.is_deadlocked(initial_state):
+            return None
+        
+        heuristic = self.heuristic(heuristic_type)
+        board = Board(initial_state)
+        table = TranspositionTable(table_size) if table_size else None
+        path = []
+        self._frontier, self._table = path, table
+        on_path = {board.key}
+        h = heuristic.evaluate(initial_state)
+        bound = h
+        
+        while True:
+            result = self._ida_search(board, heuristic, 0, h, bound, path, on_path, table)
+            if result is True:
+                break
+            if result == float('inf'):
+                return None
+            bound = result
+            if table is not None:
+                table.new_iteration()
+        
+        # Rebuild a Node chain from the winning path of direction indexes
+        node = Node(initial_state)
+        for d in path:
+            action = initial_state.level.ACTIONS[d]
+            node = Node(node.state.move(action), node, action, node.g + 1)
+        return node
+
+    def _ida_search(self, board, heuristic, g, h, bound, path, on_path, table):
+        # One depth-first iteration from the board at depth g: True when a
+        # goal is found (board and path left at the goal), otherwise the
+        # smallest f that exceeded the bound. The DFS keeps an explicit
+        # stack instead of recursing, so deep solutions do not run into
+        # the interpreter's recursion limit.
+        result = self._ida_enter(board, g, h, bound, table)
+        if result is not None:
+            return result
+        # one frame per open node: [undo record of the move into it, its h,
+        # next direction to try, smallest f seen below it]
+        stack = [[None, h, 0, float('inf')]]
+        while True:
+            frame = stack[-1]
+            d = frame[2]
+            if d == 4:
+                # every direction tried: back up to the parent
+                stack.pop()
+                if not stack:
+                    return frame[3]
+                on_path.discard(board.key)
+                path.pop()
+                board.unmake(frame[0])
+                parent = stack[-1]
+                parent[3] = min(parent[3], frame[3])
+                continue
+            frame[2] = d + 1
+            undo = board.make(d)
+            if undo is None:
+                continue
+            box_to = undo[2]
+            if box_to >= 0 and self.deadlocks.detectors and self.deadlocks.is_deadlocked(board.snapshot(), box_to):
+                board.unmake(undo)
+                continue
+            # a successor, as Search.successors would return it; one already
+            # on the path is a duplicate
+            self.board_moves += 1
+            if board.key in on_path:
+                board.unmake(undo)
                 continue
             
-            explored.add(grid_tuple)
+            if heuristic.needs_states:
+                child_h = heuristic.evaluate(board.snapshot())
+            else:
+                box_from = undo[1] if box_to >= 0 else None
+                child_h = heuristic.update(frame[1], Move(None, board, box_from, box_to if box_to >= 0 else None))
             
-            for action, successor_state in current_state.successorFunction():
-                successor_grid_tuple = tuple(tuple(row) for row in successor_state.grid)
-                
-                if successor_grid_tuple not in explored:
-                    child = Node(successor_state, current_node, action, current_node.g + 1)
-                    child.heuristic = self.calculate_heuristic(successor_state, heuristic_type)
-                    child.setF()
-                    heapq.heappush(frontier, (child.f, id(child), child))
-        
+            path.append(d)
+            on_path.add(board.key)
+            self.generated += 1
+            result = self._ida_enter(board, g + len(stack), child_h, bound, table)
+            if result is None:
+                stack.append([undo, child_h, 0, float('inf')])
+                continue
+            if result is True:
+                return True
+            on_path.discard(board.key)
+            path.pop()
+            board.unmake(undo)
+            frame[3] = min(frame[3], result)
+
+    def _ida_enter(self, board, g, h, bound, table):
+        # Visit the board at depth g: None if it is to be expanded, True at
+        # a goal, otherwise the f that cuts it off
+        f = g + h
+        if f > bound:
+            return f
+        if board.isGoal():
+            return True
+        if table is not None and not table.visit(board.key, g):
+            return float('inf')
+        self.expand()
         return None
 
-    def calculate_heuristic(self, state, heuristic_type):
-        if heuristic_type == "h1":
-            return self.h1(state)
-        elif heuristic_type == "h2":
-            return self.h2(state)
-        elif heuristic_type == "h3":
-            return self.h3(state)
-        return 0
+    def solve(self, initial_state, strategy, push_moves=False):
+        """Run a search given by a strategy name: "algorithm" or "algorithm:heuristic".
+
+        Algorithms are bfs, external (BFS on disk), astar, anytime (run to
+        the end), ida (step moves only) and bidirectional (push moves only);
+        the heuristic defaults to h2.
+        With a cache, a stored solution is returned without searching and
+        new solutions of searches that ran to the end are stored.
+        """
+        if self.cache is None:
+            return self._solve(initial_state, strategy, push_moves)
+        algorithm = strategy.partition(":")[0]
+        # the cost of these searches is always in steps, or always in pushes
+        if algorithm == "ida":
+            push_moves = False
+        elif algorithm == "bidirectional":
+            push_moves = True
+        started = time.monotonic()
+        node = self.cache.get(initial_state, strategy, push_moves)
+        if node is not None:
+            self.start()
+            self.finish(SOLVED, node)
+            return node
+        node = self._solve(initial_state, strategy, push_moves)
+        # an anytime search stopped by a limit returns its last incumbent,
+        # which is not proved optimal and must not be stored
+        if node is not None and self.result.status == SOLVED:
+            self.cache.put(initial_state, strategy, push_moves, node,
+                           self.expanded, time.monotonic() - started)
+        return node
+
+    def _solve(self, initial_state, strategy, push_moves):
+        algorithm, _, heuristic_type = strategy.partition(":")
+        heuristic_type = heuristic_type or "h2"
+        if algorithm == "bfs":
+            return self.BFS(initial_state, push_moves)
+        if algorithm == "external":
+            return self.external_BFS(initial_state, push_moves)
+        if algorithm == "astar":
+            return self.astar(initial_state, heuristic_type, push_moves)
+        if algorithm == "anytime":
+            node = None
+            for node, _ in self.anytime_astar(initial_state, heuristic_type, push_moves):
+                pass
+            return node
+        if algorithm == "ida":
+            return self.ida_star(initial_state, heuristic_type)
+        if algorithm == "bidirectional":
+            return self.bidirectional(initial_state)
+        raise ValueError(f"Unknown search strategy: {strategy}")
+
+    def run(self, initial_state, strategy, push_moves=False):
+        """Like solve, but returns the SearchResult: status, node and counters."""
+        self.solve(initial_state, strategy, push_moves)
+        return self.result
+
+    @classmethod
+    def is_optimal(cls, strategy):
+        """True if the strategy's solutions are proven optimal (in steps, or pushes)."""
+        algorithm, _, heuristic_type = strategy.partition(":")
+        if algorithm in ("bfs", "external", "bidirectional"):
+            return True
+        return (heuristic_type or "h2") in cls.ADMISSIBLE
+
+    def heuristic(self, heuristic_type):
+        """Heuristic object for a heuristic_type name (zero heuristic if unknown)."""
+        return self.heuristics.get(heuristic_type, self.zero_heuristic)
+
+    def calculate_heuristic(self, state, heuristic_type, parent=None):
+        if heuristic_type == "hm":
+            return self.hm(state, parent)
+        return self.heuristic(heuristic_type).evaluate(state)
+
+    def child_heuristic(self, heuristic, parent_state, parent_h, action, child_state):
+        """Incremental h of a child; with check_heuristics also recomputed in full."""
+        move = Move.between(parent_state, action, child_state)
+        h = heuristic.update(parent_h, move)
+        if self.check_heuristics:
+            full = heuristic.evaluate(child_state)
+            assert h == full, f"{heuristic.name}: incremental {h} != full {full}"
+        return h
     
     def h1(self, state):
-        count = 0
-        for i in range(len(state.grid)):
-            for j in range(len(state.grid[0])):
-                if state.grid[i][j] == 'B':
-                    count += 1
-        return count
+        # boxes not yet on a storage point
+        return self.heuristics["h1"].evaluate(state)
     
     def h2(self, state):
-        total_distance = 0
-        storage_points = []
-        boxes = []
-        
-        for i in range(len(state.grid)):
-            for j in range(len(state.grid[0])):
-                if state.grid[i][j] == 'S':
-                    storage_points.append((i, j))
-                elif state.grid[i][j] == 'B':
-                    boxes.append((i, j))
-        
-        if not storage_points or not boxes:
-            return 0
-            
-        for box in boxes:
-            min_dist = float('inf')
-            for storage in storage_points:
-                dist = abs(box[0] - storage[0]) + abs(box[1] - storage[1])
-                min_dist = min(min_dist, dist)
-            total_distance += min_dist
-            
-        return total_distance
+        # pushes each box needs to reach its nearest storage, walls included
+        return self.heuristics["h2"].evaluate(state)
     
     def h3(self, state):
-        box_to_storage = self.h2(state)
-        player_pos = state.findPlayer()
-        if not player_pos or player_pos[0] is None:
-            return float('inf')
-            
-        min_dist_to_box = float('inf')
-        has_box = False
-        for i in range(len(state.grid)):
-            for j in range(len(state.grid[0])):
-                if state.grid[i][j] == 'B':
-                    has_box = True
-                    dist = abs(player_pos[0] - i) + abs(player_pos[1] - j)
-                    min_dist_to_box = min(min_dist_to_box, dist)
-        
-        if not has_box:
-            return 0
-            
-        return box_to_storage + min_dist_to_box
+        # h2 plus the player's distance to the nearest misplaced box
+        return self.heuristics["h3"].evaluate(state)
+
+    def hm(self, state, parent=None):
+        # admissible: min-cost matching of boxes to targets over push distances
+        return self.matching.evaluate(state, parent)
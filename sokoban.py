@@ -1,3 +1,18 @@
+from collections import deque, namedtuple
+from itertools import combinations
+from level import Level
+
+
+class Push(namedtuple('Push', ['box', 'direction'])):
+    """
+    Macro move of the push-level search: the player walks to the cell
+    behind `box` and pushes it one cell in direction index `direction`
+    (an index into Level.ACTIONS). The walk itself is only rebuilt when
+    the solution is expanded back into step actions.
+    """
+    __slots__ = ()
+
+
 class SokobanPuzzle:
     """
     Sokoban puzzle implementation
@@ -8,114 +23,346 @@ class SokobanPuzzle:
     B: Block (box)
     '.': Player on target space
     '*': Box on target space
+
+    A state only holds the player cell and the sorted tuple of box cells;
+    walls and storage live in a Level shared by every state of the puzzle.
+    States are never modified after creation, so they can be hashed and
+    stored directly in the explored sets of the search.
+    Each state carries a 64-bit Zobrist key that is updated incrementally
+    on every move; it is the hash of the state, and equal keys are always
+    confirmed by comparing the positions themselves.
     """
-    def __init__(self, grid):
-        self.grid = grid
+    __slots__ = ('level', 'player', 'boxes', 'key')
+
+    DIRECTIONS = Level.DIRECTIONS
+
+    def __init__(self, grid, level=None):
+        if level is None:
+            level = Level(grid)
+        player, boxes = level.parse_state(grid)
+        self._set(level, player, boxes, level.zobrist_key(player, boxes))
+
+    @classmethod
+    def from_positions(cls, level, player, boxes, key=None):
+        #Build a state directly from a level, a player cell and a sorted box tuple
+        if key is None:
+            key = level.zobrist_key(player, boxes)
+        state = cls.__new__(cls)
+        state._set(level, player, boxes, key)
+        return state
+
+    def _set(self, level, player, boxes, key):
+        self.level = level
+        self.player = player
+        self.boxes = boxes
+        self.key = key
+
+    def __eq__(self, other):
+        if not isinstance(other, SokobanPuzzle):
+            return NotImplemented
+        return (self.player == other.player and self.boxes == other.boxes
+                and self.level is other.level)
+
+    def __hash__(self):
+        return self.key
+
+    @property
+    def grid(self):
+        #Grid view of the state, rebuilt on demand (drawing, printing)
+        return self.level.render(self.player, self.boxes)
 
-    """ def isGoal(self):
-        for row in self.grid:
-            if 'B' in row:  # If there's any box not on storage
-                return False
-        return True """
     def isGoal(self):
-        for row in self.grid:
-            for cell in row:
-                if cell == 'B':  #found a box that is not on storage
-                    return False
-        #check if all storage points have boxes
-        storage_count = sum(row.count('S') for row in self.grid)
-        box_on_storage_count = sum(row.count('*') for row in self.grid)
-        return storage_count == 0 and box_on_storage_count > 0
-
-    def successorFunction(self):
-        #generate all possible next states
+        #every box is on a storage point
+        return bool(self.boxes) and self.misplaced_boxes() == 0
+
+    def misplaced_boxes(self):
+        #Number of boxes not on a storage point, O(boxes)
+        target_mask = self.level.target_mask
+        count = 0
+        for box in self.boxes:
+            if not target_mask[box]:
+                count += 1
+        return count
+
+    def successorFunction(self, deadlocks=None):
+        #generate all possible next states; pushes onto dead squares are skipped,
+        #as are pushes that the optional DeadlockPipeline proves lost
         successors = []
-        directions = {
-            'right': (0, 1),
-            'left': (0, -1),
-            'up': (-1, 0),
-            'down': (1, 0)
-        }
-        
-        robot_x, robot_y = self.findPlayer()
-        if robot_x is None:
+        if self.player is None:
             return []
-            
-        for action, (dir_x, dir_y) in directions.items():
-            row_new = robot_x + dir_x
-            col_new = robot_y + dir_y
-            
-            if self.validMove(row_new, col_new, (dir_x, dir_y)):
-                new_state = SokobanPuzzle(self.copy_grid())
-                robot_on_storage = self.grid[robot_x][robot_y] == '.'
-                
-                # Handle movement from current position
-                new_state.grid[robot_x][robot_y] = 'S' if robot_on_storage else ' '
-                
-                # Handle different cases for new position
-                if new_state.grid[row_new][col_new] in [' ', 'S']:
-                    new_state.grid[row_new][col_new] = '.' if new_state.grid[row_new][col_new] == 'S' else 'R'
-                
-                elif new_state.grid[row_new][col_new] in ['B', '*']:
-                    box_x = row_new + dir_x
-                    box_y = col_new + dir_y
-                    
-                    if self.validMove(box_x, box_y, (dir_x, dir_y)):
-                        #moving the box
-                        new_state.grid[box_x][box_y] = '*' if new_state.grid[box_x][box_y] == 'S' else 'B'
-                        #mve the player
-                        new_state.grid[row_new][col_new] = '.' if new_state.grid[row_new][col_new] == '*' else 'R'
-                
-                successors.append((action, new_state))
-                    
+
+        level = self.level
+        neighbours = level.neighbours
+        dead_mask = level.dead_mask
+        zobrist_player = level.zobrist_player
+        zobrist_box = level.zobrist_box
+        boxes = self.boxes
+        # key without the player, the new player cell is xor-ed back per move
+        base_key = self.key ^ zobrist_player[self.player]
+
+        for d, player_new in enumerate(neighbours[self.player]):
+            if player_new < 0:  # wall or off the grid
+                continue
+            key = base_key ^ zobrist_player[player_new]
+            new_boxes = boxes
+            if player_new in boxes:
+                #moving the box, the player takes its place
+                box_new = neighbours[player_new][d]
+                if box_new < 0 or box_new in boxes or dead_mask[box_new]:
+                    continue
+                new_boxes = tuple(sorted(box_new if box == player_new else box for box in boxes))
+                key ^= zobrist_box[player_new] ^ zobrist_box[box_new]
+                successor = SokobanPuzzle.from_positions(level, player_new, new_boxes, key)
+                if deadlocks is not None and deadlocks.is_deadlocked(successor, box_new):
+                    continue
+            else:
+                successor = SokobanPuzzle.from_positions(level, player_new, new_boxes, key)
+            successors.append((level.ACTIONS[d], successor))
+
+        return successors
+
+    def pushSuccessorFunction(self, deadlocks=None):
+        #generate one successor per legal box push instead of per player step;
+        #the player is normalized to the top-left cell of its reachable region
+        successors = []
+        if self.player is None:
+            return []
+
+        level = self.level
+        neighbours = level.neighbours
+        dead_mask = level.dead_mask
+        zobrist_player = level.zobrist_player
+        zobrist_box = level.zobrist_box
+        boxes = self.boxes
+        box_set = set(boxes)
+        reachable = level.flood_fill(self.player, box_set)
+        base_key = self.key ^ zobrist_player[self.player]
+
+        for box in boxes:
+            for d, box_new in enumerate(neighbours[box]):
+                if box_new < 0 or box_new in box_set or dead_mask[box_new]:
+                    continue
+                #the player must be able to stand behind the box
+                if neighbours[box][level.OPPOSITE[d]] not in reachable:
+                    continue
+                new_boxes = tuple(sorted(box_new if b == box else b for b in boxes))
+                canonical = min(level.flood_fill(box, new_boxes))
+                key = base_key ^ zobrist_player[canonical] ^ zobrist_box[box] ^ zobrist_box[box_new]
+                successor = SokobanPuzzle.from_positions(level, canonical, new_boxes, key)
+                if deadlocks is not None and deadlocks.is_deadlocked(successor, box_new):
+                    continue
+                successors.append((Push(box, d), successor))
+
         return successors
 
+    def pullSuccessorFunction(self):
+        #backward moves for searching from the goal: the player stands next to
+        #a box and steps away from it, pulling the box along. Each successor
+        #comes with the Push that undoes the pull, i.e. the forward move from
+        #the successor back to this state.
+        successors = []
+        level = self.level
+        neighbours = level.neighbours
+        boxes = self.boxes
+        box_set = set(boxes)
+        reachable = level.flood_fill(self.player, box_set)
+
+        for box in boxes:
+            for d, player_from in enumerate(neighbours[box]):
+                if player_from < 0 or player_from not in reachable:
+                    continue
+                player_to = neighbours[player_from][d]
+                if player_to < 0 or player_to in box_set:
+                    continue
+                new_boxes = tuple(sorted(player_from if b == box else b for b in boxes))
+                canonical = min(level.flood_fill(player_to, new_boxes))
+                key = (self.key ^ level.zobrist_player[self.player] ^ level.zobrist_player[canonical]
+                       ^ level.zobrist_box[box] ^ level.zobrist_box[player_from])
+                successor = SokobanPuzzle.from_positions(level, canonical, new_boxes, key)
+                successors.append((Push(player_from, level.OPPOSITE[d]), successor))
+
+        return successors
+
+    @classmethod
+    def goalStates(cls, level, box_count):
+        #Every goal position with box_count boxes: boxes on a choice of targets,
+        #the player normalized in each floor region left free by the boxes
+        states = []
+        for boxes in combinations(level.target_cells, box_count):
+            free = [cell for cell in sorted(level.interior) if cell not in boxes]
+            seen = set()
+            for cell in free:
+                if cell not in seen:
+                    region = level.flood_fill(cell, boxes)
+                    seen.update(region)
+                    states.append(cls.from_positions(level, min(region), boxes))
+        return states
+
+    def applyPush(self, push):
+        #State after a Push macro move, player normalized as in pushSuccessorFunction
+        level = self.level
+        box_new = level.neighbours[push.box][push.direction]
+        new_boxes = tuple(sorted(box_new if b == push.box else b for b in self.boxes))
+        canonical = min(level.flood_fill(push.box, new_boxes))
+        key = (self.key ^ level.zobrist_player[self.player] ^ level.zobrist_player[canonical]
+               ^ level.zobrist_box[push.box] ^ level.zobrist_box[box_new])
+        return SokobanPuzzle.from_positions(level, canonical, new_boxes, key)
+
+    def move(self, action):
+        #State after one player step, or None if the step is not allowed
+        for successor_action, successor in self.successorFunction():
+            if successor_action == action:
+                return successor
+        return None
+
+    def walkPath(self, target):
+        #Shortest list of step actions taking the player to target without pushing
+        level = self.level
+        neighbours = level.neighbours
+        parents = {self.player: None}
+        queue = deque([self.player])
+        while queue:
+            cell = queue.popleft()
+            if cell == target:
+                actions = []
+                while parents[cell] is not None:
+                    cell, d = parents[cell]
+                    actions.append(level.ACTIONS[d])
+                actions.reverse()
+                return actions
+            for d, next_cell in enumerate(neighbours[cell]):
+                if next_cell >= 0 and next_cell not in parents and next_cell not in self.boxes:
+                    parents[next_cell] = (cell, d)
+                    queue.append(next_cell)
+        return None
+
+    def expandPushes(self, pushes):
+        #Expand Push macro moves made from this state into step actions;
+        #returns the actions and the states visited, this state included
+        actions = []
+        states = [self]
+        state = self
+        level = self.level
+        for push in pushes:
+            player_from = level.neighbours[push.box][level.OPPOSITE[push.direction]]
+            for action in state.walkPath(player_from) + [level.ACTIONS[push.direction]]:
+                state = state.move(action)
+                actions.append(action)
+                states.append(state)
+        return actions, states
 
     def validMove(self, new_row, new_col, direction):
         #Check if a move is valid mchi contradict some game rules
-        if not (0 <= new_row < len(self.grid) and 0 <= new_col < len(self.grid[0])):
+        level = self.level
+        if not level.in_bounds(new_row, new_col):
             return False
-        
-        if self.grid[new_row][new_col] == 'O':
+
+        index = new_row * level.width + new_col
+        if level.wall_mask[index]:
             return False
-        
-        if self.grid[new_row][new_col] in ['B', '*']:
+
+        if index in self.boxes:
             next_row = new_row + direction[0]
             next_col = new_col + direction[1]
-            
-            if not (0 <= next_row < len(self.grid) and 0 <= next_col < len(self.grid[0])):
+
+            if not level.in_bounds(next_row, next_col):
                 return False
-            
-            if self.grid[next_row][next_col] not in [' ', 'S']:
+
+            next_index = next_row * level.width + next_col
+            if level.wall_mask[next_index] or next_index in self.boxes:
                 return False
-        
+
         return True
-    
+
     def copy_grid(self):
-        #Create a deep copy of the grid to not lose when changing states
-        return [row[:] for row in self.grid]
-    
+        #Fresh list-of-lists copy of the grid, safe to modify
+        return self.grid
+
     def findPlayer(self):
-        #Find the player's position in the grid 
-        for row in range(len(self.grid)):
-            for col in range(len(self.grid[row])):
-                if self.grid[row][col] in ['R', '.']:
-                    return row, col
-        return None, None
-    
+        #Find the player's position in the grid
+        if self.player is None:
+            return None, None
+        return self.level.position(self.player)
+
     def print_grid(self):
         #Print the current state of the grid : to see each step
         for row in self.grid:
             print(' '.join(row))
 
     def get_boxes(self):
-            #Return a list of positions of the boxes in the grid
-            boxes = []
-            for row in range(len(self.grid)):
-                for col in range(len(self.grid[row])):
-                    if self.grid[row][col] in ['B', '*']:  # Box or Box on Storage
-                        boxes.append((row, col))
-            return boxes
+        #Return a list of positions of the boxes in the grid
+        return [self.level.position(box) for box in self.boxes]
+
+
+class Board:
+    """
+    Mutable counterpart of SokobanPuzzle for depth-first searches that make
+    and unmake moves in place (IDA*): one board is shared by the whole
+    search instead of allocating a state per node. The Zobrist key and the
+    number of misplaced boxes are kept up to date on every move, so the
+    goal test is O(1).
+    """
+    def __init__(self, state):
+        self.level = state.level
+        self.player = state.player
+        self.key = state.key
+        self.box_mask = bytearray(state.level.width * state.level.height)
+        self.box_set = set(state.boxes)
+        for box in state.boxes:
+            self.box_mask[box] = 1
+        self.misplaced = state.misplaced_boxes()
+
+    @property
+    def boxes(self):
+        return tuple(sorted(self.box_set))
+
+    def make(self, d):
+        #Move the player in direction index d; returns the undo record
+        #(old player, box cell before, box cell after or -1) or None if illegal
+        level = self.level
+        player_new = level.neighbours[self.player][d]
+        if player_new < 0:
+            return None
+        box_new = -1
+        if self.box_mask[player_new]:
+            box_new = level.neighbours[player_new][d]
+            if box_new < 0 or self.box_mask[box_new] or level.dead_mask[box_new]:
+                return None
+            self._move_box(player_new, box_new)
+        undo = (self.player, player_new, box_new)
+        self.key ^= level.zobrist_player[self.player] ^ level.zobrist_player[player_new]
+        self.player = player_new
+        return undo
+
+    def unmake(self, undo):
+        player_old, player_new, box_new = undo
+        level = self.level
+        self.key ^= level.zobrist_player[player_new] ^ level.zobrist_player[player_old]
+        self.player = player_old
+        if box_new >= 0:
+            self._move_box(box_new, player_new)
+
+    def _move_box(self, box_from, box_to):
+        level = self.level
+        self.box_mask[box_from] = 0
+        self.box_mask[box_to] = 1
+        self.box_set.remove(box_from)
+        self.box_set.add(box_to)
+        self.key ^= level.zobrist_box[box_from] ^ level.zobrist_box[box_to]
+        self.misplaced += level.target_mask[box_from] - level.target_mask[box_to]
+
+    def isGoal(self):
+        return self.misplaced == 0 and bool(self.box_set)
+
+    def misplaced_boxes(self):
+        return self.misplaced
+
+    def findPlayer(self):
+        return self.level.position(self.player)
+
+    def snapshot(self):
+        #Immutable SokobanPuzzle of the current position
+        return SokobanPuzzle.from_positions(self.level, self.player, self.boxes, self.key)
 
 
 """     def successorFunction(self):
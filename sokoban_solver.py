@@ -0,0 +1,128 @@
+"""
+Headless command line solver, no pygame needed:
+
+    python -m sokoban_solver batch levels.xsb --jobs 16 --algo astar:h2
+
+solves every level of an XSB collection in a pool of processes and prints
+one JSON line per level as soon as it is solved.
+"""
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from limits import Limits, peak_memory
+from search import Search
+from solution_cache import SolutionCache
+from sokoban import SokobanPuzzle
+from xsb import LevelCollection, read_levels
+
+# first letter of each action, upper case for a push (LURD notation)
+LURD = {'right': 'r', 'left': 'l', 'up': 'u', 'down': 'd'}
+
+
+def solution_string(node):
+    #LURD string of a solution node
+    actions = node.getSolution()
+    states = node.getPath()
+    moves = []
+    for action, state, next_state in zip(actions, states, states[1:]):
+        letter = LURD[action]
+        moves.append(letter.upper() if next_state.boxes != state.boxes else letter)
+    return ''.join(moves)
+
+
+def solve_level(task):
+    """Solve one (index, title, grid, algo, push_moves, limits, cache path, stats) task; returns its JSON record."""
+    index, title, grid, algo, push_moves, limits, cache_path, stats = task
+    record = {"index": index, "title": title, "algo": algo, "push_moves": push_moves}
+    cache = SolutionCache(cache_path) if cache_path else None
+    search = Search(limits=limits, cache=cache, stats=stats)
+    start = time.perf_counter()
+    try:
+        node = search.solve(SokobanPuzzle(grid), algo, push_moves)
+    except Exception as e:
+        node = None
+        record["error"] = repr(e)
+    record["seconds"] = round(time.perf_counter() - start, 4)
+    record["solved"] = search.result is not None and search.result.solved
+    if search.result is not None:
+        # solved, unsolvable, node_limit, time_limit, memory_limit or cancelled
+        record["status"] = search.result.status
+    if node is not None:
+        solution = solution_string(node)
+        record["solution"] = solution
+        record["cost"] = node.g
+        record["steps"] = len(solution)
+        record["pushes"] = sum(1 for move in solution if move.isupper())
+    record["expanded"] = search.expanded
+    if search.stats is not None:
+        record["stats"] = search.stats.as_dict()
+    if cache is not None:
+        record["cached"] = cache.hits > 0
+        cache.close()
+    # each task runs in a fresh process, so this is the peak of this level
+    peak = peak_memory()
+    if peak is not None:
+        record["peak_rss_kb"] = peak // 1024
+    return record
+
+
+def selected_levels(path, select):
+    #(index, (title, grid)) of the levels chosen by select ("7" or "10:20",
+    #Python slice style), or of every level when select is None
+    if select is None:
+        return enumerate(read_levels(path))
+    collection = LevelCollection(path)
+    if ":" in select:
+        start, stop = (int(part) if part else None for part in select.split(":", 1))
+        indices = range(len(collection))[start:stop]
+    else:
+        indices = [range(len(collection))[int(select)]]
+    return ((index, collection[index]) for index in indices)
+
+
+def batch(args):
+    limits = Limits(args.max_nodes, args.time_limit, args.max_memory)
+    tasks = ((index, title, grid, args.algo, args.push_moves, limits, args.cache, args.stats)
+             for index, (title, grid) in selected_levels(args.levels, args.select))
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        # one task per worker process, so peak memory is per level
+        with multiprocessing.Pool(args.jobs, maxtasksperchild=1) as pool:
+            for record in pool.imap_unordered(solve_level, tasks):
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="sokoban_solver", description="Headless Sokoban solver")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch_parser = commands.add_parser("batch", help="solve every level of an XSB collection")
+    batch_parser.add_argument("levels", help="XSB (.sok) level collection")
+    batch_parser.add_argument("--select", help='only solve the level at this index, or a slice such as "100:200"')
+    batch_parser.add_argument("--jobs", type=int, default=multiprocessing.cpu_count(),
+                              help="worker processes (default: one per CPU)")
+    batch_parser.add_argument("--algo", default="astar:h2",
+                              help="strategy: bfs, external, astar:h1..h3/hm/hp, anytime:hX, ida:hX or bidirectional")
+    batch_parser.add_argument("--push-moves", action="store_true",
+                              help="search over box pushes instead of steps")
+    batch_parser.add_argument("--max-nodes", type=int, help="give up a level after this many expansions")
+    batch_parser.add_argument("--time-limit", type=float, help="give up a level after this many seconds")
+    batch_parser.add_argument("--max-memory", type=int, help="give up a level above this many bytes of memory")
+    batch_parser.add_argument("--cache", help="SQLite solution cache to reuse and fill")
+    batch_parser.add_argument("--stats", action="store_true",
+                              help="add the search counters and time split (SearchStats) to each record")
+    batch_parser.add_argument("--output", help="write the JSON lines to this file instead of stdout")
+    batch_parser.set_defaults(run=batch)
+
+    args = parser.parse_args(argv)
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from node import NodeTable
+
+
+class SolutionCache:
+    """
+    Solutions kept on disk in a SQLite database, so a level is only solved
+    once per strategy. Entries are keyed by a hash of the level's canonical
+    text (Level.canonical_text), the strategy name and the move mode, and
+    hold the step actions, the cost and the search counters. The cache
+    keeps at most max_entries solutions and evicts the least recently used.
+
+    A cached solution is only returned after replaying it on the level:
+    every move must be legal, the last state a goal and the cost must
+    match. An entry that fails is deleted.
+    """
+    DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".sokoban_solutions.sqlite")
+    # one letter per action, in Level.ACTIONS order
+    LETTERS = 'rlud'
+
+    def __init__(self, path=DEFAULT_PATH, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # SQLite connections belong to the thread that opened them: the GUI
+        # searches on a new thread each time and forked workers must not
+        # share their parent's connection
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        #one connection per thread and process, opened on first use
+        local = self._local
+        if getattr(local, 'connection', None) is None or local.pid != os.getpid():
+            local.connection = sqlite3.connect(self.path, timeout=30)
+            local.pid = os.getpid()
+            local.connection.execute(
+                "CREATE TABLE IF NOT EXISTS solutions ("
+                " level TEXT, strategy TEXT, push_moves INTEGER,"
+                " actions TEXT, cost INTEGER, expanded INTEGER, seconds REAL,"
+                " last_used REAL,"
+                " PRIMARY KEY (level, strategy, push_moves))")
+            local.connection.execute(
+                "CREATE INDEX IF NOT EXISTS solutions_last_used ON solutions (last_used)")
+        return local.connection
+
+    @staticmethod
+    def level_hash(state):
+        """Hex digest identifying the position of state, however it was written down."""
+        text = state.level.canonical_text(state.player, state.boxes)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, state, strategy, push_moves=False):
+        """Replay-checked solution node (step moves) for state, or None."""
+        key = (self.level_hash(state), strategy, int(push_moves))
+        with self.connection as db:
+            row = db.execute("SELECT actions, cost FROM solutions"
+                             " WHERE level = ? AND strategy = ? AND push_moves = ?", key).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            node = self._replay(state, row[0], row[1], push_moves)
+            if node is None:
+                db.execute("DELETE FROM solutions WHERE level = ? AND strategy = ? AND push_moves = ?", key)
+                self.misses += 1
+                return None
+            db.execute("UPDATE solutions SET last_used = ?"
+                       " WHERE level = ? AND strategy = ? AND push_moves = ?", (time.time(),) + key)
+        self.hits += 1
+        return node
+
+    def put(self, state, strategy, push_moves, node, expanded=None, seconds=None):
+        """Store the solution node found by strategy for state."""
+        actions = ''.join(self.LETTERS[state.level.ACTIONS.index(action)] for action in node.getSolution())
+        key = (self.level_hash(state), strategy, int(push_moves))
+        with self.connection as db:
+            db.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                       key + (actions, node.g, expanded, seconds, time.time()))
+            excess = db.execute("SELECT COUNT(*) FROM solutions").fetchone()[0] - self.max_entries
+            if excess > 0:
+                db.execute("DELETE FROM solutions WHERE rowid IN"
+                           " (SELECT rowid FROM solutions ORDER BY last_used LIMIT ?)", (excess,))
+
+    def _replay(self, state, actions, cost, push_moves):
+        #Solution node if actions solve state at the stored cost, else None
+        #(a node over pushes when push_moves is set, like the search made)
+        root = state
+        level = state.level
+        codes = []
+        push_codes = []  # NodeTable push codes: box index * 4 + direction
+        for letter in actions:
+            d = self.LETTERS.find(letter)
+            if d < 0:
+                return None
+            child = state.move(level.ACTIONS[d])
+            if child is None:
+                return None
+            if child.boxes != state.boxes:
+                push_codes.append(state.boxes.index(child.player) * 4 + d)
+            codes.append(d)
+            state = child
+        if push_moves:
+            codes = push_codes
+        if not state.isGoal() or cost != len(codes):
+            return None
+        return NodeTable(root, push_moves).follow(codes)
+
+    def close(self):
+        #close the connection of the calling thread
+        local = self._local
+        if getattr(local, 'connection', None) is not None:
+            local.connection.close()
+            local.connection = None
@@ -0,0 +1,230 @@
+import time
+
+
+class SearchStats:
+    """
+    Counters and timings of one search, filled in by Search(stats=True)
+    and returned as SearchResult.stats.
+
+    The counters are exact: successors produced, nodes generated (new
+    nodes kept) and expanded, duplicates skipped (successors already seen
+    or closed, or for IDA* already on the path or cut by the
+    transposition table), deadlock prunes (detector pipeline plus states a
+    heuristic proved unsolvable), the peak size of the frontier and the
+    size of the closed set at the end (None where a search keeps none in
+    memory). The frontier of IDA* is its current path, so its peak is the
+    deepest path sampled; BFS keeps no frontier of its own and reports the
+    nodes generated but not yet expanded.
+
+    Timings are sampled: one expansion cycle in StatsCollector.SAMPLE_EVERY
+    (from one expand() call to the next) is timed in detail, and the search
+    time is split in the proportions measured on these cycles. The peak
+    frontier is sampled at the start of these cycles as well.
+    successor_seconds is spent generating successors (moves, deadlock
+    checks, Zobrist keys), heuristic_seconds in child heuristics, and
+    hashing_seconds is the rest: duplicate detection in the seen sets,
+    node bookkeeping and the open list. Searches that do not go through
+    Search.successors (IDA*) only report the counters.
+    """
+    def __init__(self):
+        self.expanded = 0
+        self.generated = 0
+        self.successors = 0  # before duplicate detection
+        self.duplicates = 0
+        self.deadlock_prunes = 0
+        self.peak_frontier = None
+        self.closed = None
+        self.seconds = 0.0
+        # sampled expansion cycles and how their time splits up
+        self.samples = 0
+        self.sampled_seconds = 0.0
+        self.sampled_successor_seconds = 0.0
+        self.sampled_heuristic_seconds = 0.0
+
+    def _scaled(self, seconds):
+        #share of the search time, as measured on the sampled cycles
+        if not self.sampled_seconds:
+            return 0.0
+        return self.seconds * seconds / self.sampled_seconds
+
+    @property
+    def successor_seconds(self):
+        return self._scaled(self.sampled_successor_seconds)
+
+    @property
+    def heuristic_seconds(self):
+        return self._scaled(self.sampled_heuristic_seconds)
+
+    @property
+    def hashing_seconds(self):
+        rest = self.sampled_seconds - self.sampled_successor_seconds - self.sampled_heuristic_seconds
+        return self._scaled(max(rest, 0.0))
+
+    def as_dict(self):
+        """Plain dict of every counter and timing, for JSON output."""
+        return {
+            "expanded": self.expanded,
+            "generated": self.generated,
+            "successors": self.successors,
+            "duplicates": self.duplicates,
+            "deadlock_prunes": self.deadlock_prunes,
+            "peak_frontier": self.peak_frontier,
+            "closed": self.closed,
+            "seconds": round(self.seconds, 6),
+            "successor_seconds": round(self.successor_seconds, 6),
+            "heuristic_seconds": round(self.heuristic_seconds, 6),
+            "hashing_seconds": round(self.hashing_seconds, 6),
+        }
+
+    @staticmethod
+    def _text(count):
+        return '-' if count is None else str(count)
+
+    def lines(self):
+        """Short text lines for on-screen display."""
+        lines = [
+            f"Expanded: {self.expanded}  Generated: {self.generated}",
+            f"Duplicates: {self.duplicates}  Deadlocks: {self.deadlock_prunes}",
+            f"Peak frontier: {self._text(self.peak_frontier)}  Closed: {self._text(self.closed)}",
+        ]
+        if self.samples:
+            lines.append(f"Time: {self.seconds:.3f}s (successors {self.successor_seconds:.3f}s,"
+                         f" heuristic {self.heuristic_seconds:.3f}s, hashing {self.hashing_seconds:.3f}s)")
+        else:
+            lines.append(f"Time: {self.seconds:.3f}s")
+        return lines
+
+
+class StatsCollector:
+    """
+    Fills a SearchStats for every search of a Search(stats=True).
+
+    Its methods stand in for the search's successors, predecessors,
+    child_heuristic and check_limits: they are set once as attributes of
+    the Search object when it is created, so a Search without stats runs
+    its plain methods, and switching between counting and timing during a
+    search is one attribute store. Sampled cycles are started from
+    check_limits, which expand() already calls every check_every
+    expansions; the collector just brings that call forward.
+    """
+    SAMPLE_EVERY = 128
+
+    def __init__(self, search):
+        self.search = search
+        self.stats = None
+        self.successors = 0
+        self.deadlock_prunes = 0
+        self.next_limits = None  # expansion count of the next real limit check
+        self.next_sample = None
+        self.sample_start = None
+        self.sampled_successors = False
+        # the search's own methods, looked up before they are replaced
+        self.plain_check_limits = search.check_limits
+        self.plain_child_heuristic = search.child_heuristic
+        search.successors = self.count_successors
+        search.predecessors = self.count_predecessors
+        search.child_heuristic = self.plain_child_heuristic
+        search.check_limits = self.check_limits
+
+    def _pipeline_prunes(self):
+        return sum(detector.prunes for detector in self.search.deadlocks.detectors)
+
+    def start(self):
+        """New SearchStats for the search that is starting (after its counters are reset)."""
+        search = self.search
+        self.stats = SearchStats()
+        self.successors = 0
+        self.deadlock_prunes = self._pipeline_prunes()
+        self.sample_start = None
+        search.successors = self.count_successors
+        search.predecessors = self.count_predecessors
+        search.child_heuristic = self.plain_child_heuristic
+        # sample from the first expansion on
+        self.next_limits = search.next_check
+        self.next_sample = search.next_check = 0
+        return self.stats
+
+    def finish(self, seconds):
+        #Final counters of the search that just ended
+        search = self.search
+        stats = self.stats
+        stats.expanded = search.expanded
+        stats.generated = search.generated
+        stats.seconds = seconds
+        stats.deadlock_prunes = self._pipeline_prunes() - self.deadlock_prunes + search.pruned
+        stats.successors = self.successors + search.board_moves
+        stats.duplicates = max(stats.successors - search.generated - search.pruned, 0)
+        if search._table is not None:
+            stats.duplicates += search._table.cuts
+        if search._closed is not None:
+            stats.closed = sum(len(closed) for closed in search._closed)
+
+    def count_successors(self, state, push_moves=False):
+        deadlocks = self.search.deadlocks
+        if push_moves:
+            successors = state.pushSuccessorFunction(deadlocks)
+        else:
+            successors = state.successorFunction(deadlocks)
+        self.successors += len(successors)
+        return successors
+
+    def count_predecessors(self, state):
+        successors = state.pullSuccessorFunction()
+        self.successors += len(successors)
+        return successors
+
+    def timed_successors(self, state, push_moves=False):
+        start = time.perf_counter()
+        successors = self.count_successors(state, push_moves)
+        self.stats.sampled_successor_seconds += time.perf_counter() - start
+        self.sampled_successors = True
+        return successors
+
+    def timed_predecessors(self, state):
+        start = time.perf_counter()
+        successors = self.count_predecessors(state)
+        self.stats.sampled_successor_seconds += time.perf_counter() - start
+        self.sampled_successors = True
+        return successors
+
+    def timed_child_heuristic(self, *args):
+        start = time.perf_counter()
+        h = self.plain_child_heuristic(*args)
+        self.stats.sampled_heuristic_seconds += time.perf_counter() - start
+        return h
+
+    def check_limits(self):
+        search = self.search
+        if search.expanded >= self.next_sample:
+            self._sample()
+        if search.expanded >= self.next_limits:
+            self.plain_check_limits()
+            self.next_limits = search.next_check
+        search.next_check = min(self.next_limits, self.next_sample)
+
+    def _sample(self):
+        #End the timed cycle started at the previous expansion, or start one
+        search = self.search
+        stats = self.stats
+        if self.sample_start is not None:
+            if self.sampled_successors:
+                stats.samples += 1
+                stats.sampled_seconds += time.perf_counter() - self.sample_start
+            self.sample_start = None
+            search.successors = self.count_successors
+            search.predecessors = self.count_predecessors
+            search.child_heuristic = self.plain_child_heuristic
+            self.next_sample = search.expanded + self.SAMPLE_EVERY - 1
+            return
+        if search._frontier is not None:
+            frontier = len(search._frontier)
+        else:
+            frontier = search.generated - search.expanded + 1
+        if stats.peak_frontier is None or frontier > stats.peak_frontier:
+            stats.peak_frontier = frontier
+        search.successors = self.timed_successors
+        search.predecessors = self.timed_predecessors
+        search.child_heuristic = self.timed_child_heuristic
+        self.next_sample = search.expanded + 1
+        self.sampled_successors = False
+        self.sample_start = time.perf_counter()
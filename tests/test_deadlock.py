@@ -0,0 +1,144 @@
+import pytest
+from benchmark import bundled_levels
+from deadlock import BlockDeadlock, CorralDeadlock, DeadlockPipeline, FreezeDeadlock
+from search import Search
+from sokoban import SokobanPuzzle
+
+
+def puzzle(rows):
+    return SokobanPuzzle([list(row) for row in rows])
+
+
+def cell(state, row, col):
+    return row * state.level.width + col
+
+
+def on_targets(rows):
+    #Same level with every box on a target and no other target
+    return [row.replace('B', '*').replace('S', ' ') for row in rows]
+
+
+# two boxes pushed against the top wall: a 2x2 block of walls and boxes
+BLOCK = [
+    "OOOOOOO",
+    "O BB  O",
+    "O     O",
+    "O  R  O",
+    "OS S  O",
+    "OOOOOOO",
+]
+
+# a wall above the left box and below the right one: both are frozen,
+# but no 2x2 block holds them
+FREEZE = [
+    "OOOOOOO",
+    "O  O  O",
+    "O  BB O",
+    "O   O O",
+    "O R  SO",
+    "O    SO",
+    "OOOOOOO",
+]
+
+# the box pushed into the doorway shuts the lower room off; both boxes
+# can only end up on the bottom row, which has no target
+CORRAL = [
+    "OOOOOOOOO",
+    "O       O",
+    "O  R    O",
+    "OOOBOOOOO",
+    "OS  B  SO",
+    "O       O",
+    "OOOOOOOOO",
+]
+
+# the same corral with a target below the doorway, so it can be solved
+OPEN_CORRAL = [
+    "OOOOOOOOO",
+    "O       O",
+    "O  R    O",
+    "OOOBOOOOO",
+    "O   B  SO",
+    "O  S    O",
+    "OOOOOOOOO",
+]
+
+
+def test_block_off_target():
+    state = puzzle(BLOCK)
+    assert BlockDeadlock().detect(state, cell(state, 1, 2))
+    assert BlockDeadlock().detect(state, cell(state, 1, 3))
+
+
+def test_block_on_targets():
+    state = puzzle(on_targets(BLOCK))
+    assert not BlockDeadlock().detect(state, cell(state, 1, 2))
+    assert not FreezeDeadlock().detect(state, cell(state, 1, 2))
+
+
+def test_freeze_off_target():
+    state = puzzle(FREEZE)
+    box = cell(state, 2, 3)
+    assert not state.level.dead_mask[box]
+    assert FreezeDeadlock().detect(state, box)
+    assert not BlockDeadlock().detect(state, box)
+
+
+def test_freeze_on_targets():
+    state = puzzle(on_targets(FREEZE))
+    assert not FreezeDeadlock().detect(state, cell(state, 2, 3))
+    assert not FreezeDeadlock().detect(state, cell(state, 2, 4))
+
+
+def test_freeze_single_box():
+    # without its neighbour the box can still be pushed sideways
+    state = puzzle([row.replace('BB', 'B ') for row in FREEZE])
+    assert not FreezeDeadlock().detect(state, cell(state, 2, 3))
+
+
+def test_corral_unsolvable():
+    state = puzzle(CORRAL)
+    box = cell(state, 3, 3)
+    assert CorralDeadlock().detect(state, box)
+    assert not BlockDeadlock().detect(state, box)
+    assert not FreezeDeadlock().detect(state, box)
+
+
+def test_corral_solvable():
+    state = puzzle(OPEN_CORRAL)
+    assert not CorralDeadlock().detect(state, cell(state, 3, 3))
+
+
+def test_corral_budget_keeps_state():
+    # out of budget, the corral search must not prune
+    state = puzzle(CORRAL)
+    assert not CorralDeadlock(max_nodes=0).detect(state, cell(state, 3, 3))
+
+
+def test_corral_without_corral():
+    state = puzzle(FREEZE)
+    assert not CorralDeadlock().detect(state, cell(state, 2, 3))
+
+
+def test_pipeline_counters():
+    pipeline = DeadlockPipeline.full()
+    state = puzzle(CORRAL)
+    assert pipeline.is_deadlocked(state, cell(state, 3, 3))
+    assert pipeline.stats() == {
+        "block": {"checks": 1, "prunes": 0},
+        "freeze": {"checks": 1, "prunes": 0},
+        "corral": {"checks": 1, "prunes": 1},
+    }
+    pipeline.reset()
+    assert all(counts == {"checks": 0, "prunes": 0} for counts in pipeline.stats().values())
+
+
+@pytest.mark.parametrize("push_moves", [False, True])
+@pytest.mark.parametrize("index", [1, 2, 3, 5])
+def test_full_pipeline_keeps_bfs_cost(index, push_moves):
+    grid = bundled_levels()[index]
+    plain = Search(DeadlockPipeline([])).run(SokobanPuzzle(grid), "bfs", push_moves)
+    pruned = Search(DeadlockPipeline.full()).run(SokobanPuzzle(grid), "bfs", push_moves)
+    assert plain.status == pruned.status == "solved"
+    assert pruned.node.g == plain.node.g
+    assert pruned.expanded <= plain.expanded
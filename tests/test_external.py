@@ -0,0 +1,27 @@
+import os
+import pytest
+from benchmark import bundled_levels
+from external import ExternalBFS
+from search import Search
+from sokoban import SokobanPuzzle
+
+
+@pytest.mark.parametrize("push_moves", [False, True])
+@pytest.mark.parametrize("index", [1, 2, 3])
+def test_tiny_memory_limit_spills(tmp_path, index, push_moves):
+    grid = bundled_levels()[index]
+    search = Search()
+    search.start()  # what Search.external_BFS does before solving
+    external = ExternalBFS(search, memory_limit=256, directory=str(tmp_path))
+    node = external.solve(SokobanPuzzle(grid), push_moves)
+    assert external.spills > 0
+    assert node.g == Search().BFS_length(SokobanPuzzle(grid), push_moves)
+    # the working directory and its runs are gone
+    assert os.listdir(tmp_path) == []
+
+
+def test_external_bfs_entry_point(tmp_path):
+    grid = bundled_levels()[3]
+    node = Search().external_BFS(SokobanPuzzle(grid), memory_limit=256, directory=str(tmp_path))
+    assert node.g == Search().BFS_length(SokobanPuzzle(grid))
+    assert os.listdir(tmp_path) == []
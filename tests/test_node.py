@@ -0,0 +1,47 @@
+from benchmark import bundled_levels
+from node import NodeSet, NodeTable
+from sokoban import SokobanPuzzle
+
+
+def reachable_states(state, count):
+    #First count states of a breadth-first walk from state
+    states = [state]
+    seen = {state}
+    for current in states:
+        for _, successor in current.successorFunction():
+            if successor not in seen and len(states) < count:
+                seen.add(successor)
+                states.append(successor)
+    return states
+
+
+def test_table_rebuilds_states():
+    root = SokobanPuzzle(bundled_levels()[4])
+    table = NodeTable(root)
+    states = reachable_states(root, 200)
+    for state in states:
+        table.add(state)
+    for index, state in enumerate(states):
+        rebuilt = table.state(index)
+        assert rebuilt == state
+        assert rebuilt.key == state.key
+        assert table.node(index).state == state
+
+
+def test_node_set_membership():
+    root = SokobanPuzzle(bundled_levels()[4])
+    table = NodeTable(root)
+    members = NodeSet(table, size=4)  # small, so it grows several times
+    states = reachable_states(root, 300)
+    for state in states[:200]:
+        assert members.add(state, len(table))
+        table.add(state)
+    assert len(members) == 200
+    for state in states[:200]:
+        # an equal state built separately is found as well
+        copy = SokobanPuzzle.from_positions(state.level, state.player, state.boxes)
+        assert copy in members
+        assert not members.add(copy, len(table))
+    for state in states[200:]:
+        assert state not in members
+    assert len(members) == 200
@@ -0,0 +1,28 @@
+from benchmark import bundled_levels
+from limits import Limits
+from parallel import Portfolio
+from sokoban import SokobanPuzzle
+
+
+def test_limit_stopped_incumbent_does_not_win():
+    state = SokobanPuzzle(bundled_levels()[4])
+    portfolio = Portfolio(("anytime:h2", "bfs"), require_optimal=True, limits=Limits(max_nodes=200))
+    node = portfolio.solve(state)
+    # bfs runs out of nodes without a solution, so the incumbent is kept
+    # as a fallback but not reported as solved
+    assert node is not None
+    assert portfolio.winner == "anytime:h2"
+    assert portfolio.result.status == "node_limit"
+
+
+def test_limit_stopped_incumbent_is_not_solved():
+    state = SokobanPuzzle(bundled_levels()[4])
+    portfolio = Portfolio(("anytime:h2",), limits=Limits(max_nodes=200))
+    assert portfolio.solve(state) is not None
+    assert portfolio.result.status == "node_limit"
+
+
+def test_all_strategies_failing_is_an_error():
+    portfolio = Portfolio(strategies=("bogus",))
+    assert portfolio.solve(SokobanPuzzle(bundled_levels()[1])) is None
+    assert portfolio.result.status == "error"
@@ -0,0 +1,23 @@
+from benchmark import bundled_levels
+from limits import Limits
+from search import Search
+from solution_cache import SolutionCache
+from sokoban import SokobanPuzzle
+
+
+def test_limit_stopped_solution_not_cached(tmp_path):
+    cache = SolutionCache(str(tmp_path / "cache.sqlite"))
+    grid = bundled_levels()[4]
+    stopped = Search(limits=Limits(max_nodes=200), cache=cache).run(SokobanPuzzle(grid), "anytime:h2")
+    assert stopped.status == "node_limit"
+    assert stopped.node is not None
+
+    full = Search(cache=cache).run(SokobanPuzzle(grid), "anytime:h2")
+    assert full.status == "solved"
+    assert full.node.g == 34
+    assert cache.hits == 0
+
+    cached = Search(cache=cache).run(SokobanPuzzle(grid), "anytime:h2")
+    assert cached.node.g == 34
+    assert cache.hits == 1
+    cache.close()
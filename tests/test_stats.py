@@ -0,0 +1,26 @@
+import pytest
+from benchmark import bundled_levels
+from search import Search
+from sokoban import SokobanPuzzle
+
+
+@pytest.mark.parametrize("algo", ["bfs", "astar:h2", "ida:h2"])
+def test_counters_add_up(algo):
+    search = Search(stats=True)
+    result = search.run(SokobanPuzzle(bundled_levels()[3]), algo)
+    stats = result.stats
+    assert result.solved
+    assert stats.expanded == result.expanded
+    assert stats.generated == result.generated
+    assert stats.successors >= stats.generated
+    assert stats.successors - stats.generated - search.pruned <= stats.duplicates
+    assert stats.peak_frontier is not None
+
+
+def test_ida_stats():
+    result = Search(stats=True).run(SokobanPuzzle(bundled_levels()[3]), "ida:h2")
+    stats = result.stats
+    assert stats.successors > 0
+    assert stats.closed is None
+    # the frontier is the current path, never deeper than the solution
+    assert 0 < stats.peak_frontier <= result.node.g
@@ -0,0 +1,25 @@
+from xsb import LevelCollection, read_levels
+
+COLLECTION = (
+    "; Level by Jos\xe9\n"
+    "#####\n"
+    "#@$.#\n"
+    "#####\n"
+    "\n"
+    "; Caf\xe9 2\n"
+    "######\n"
+    "#@$ .#\n"
+    "######\n"
+).encode("latin-1")
+
+
+def test_latin1_titles(tmp_path):
+    path = tmp_path / "latin1.sok"
+    path.write_bytes(COLLECTION)
+    levels = list(read_levels(str(path)))
+    assert [title for title, _ in levels] == ["Level by Jos�", "Caf� 2"]
+    assert levels[1][1][1] == ['O', 'R', 'B', ' ', 'S', 'O']
+
+    collection = LevelCollection(str(path))
+    assert len(collection) == 2
+    assert collection[-1] == levels[1]
@@ -0,0 +1,109 @@
+import io
+
+# XSB symbol -> project symbol (see SokobanPuzzle)
+XSB_SYMBOLS = {
+    '#': 'O',  # wall
+    '@': 'R',  # player
+    '+': '.',  # player on storage
+    '$': 'B',  # box
+    '*': '*',  # box on storage
+    '.': 'S',  # storage
+    ' ': ' ',
+    '-': ' ',
+    '_': ' ',
+}
+
+
+def is_board_line(line):
+    #A board row holds only XSB symbols and at least one wall
+    return '#' in line and all(symbol in XSB_SYMBOLS for symbol in line)
+
+
+def to_grid(rows):
+    #Translate XSB rows into a SokobanPuzzle grid
+    return [[XSB_SYMBOLS[symbol] for symbol in row] for row in rows]
+
+
+def _scan(f):
+    #Yield (start, end, title, rows) for every level of a binary file f:
+    #the byte range covers the level's title lines, its board and a
+    #"Title:" line after it, so parsing just that range gives the level
+    title = None
+    rows = []
+    start = offset = f.tell()
+    for raw in f:
+        line_start = offset
+        offset += len(raw)
+        # board rows are ASCII; titles and comments in another encoding
+        # (Latin-1 is common in .sok files) only get replacement characters
+        line = raw.decode("utf-8", errors="replace").rstrip('\r\n')
+        if is_board_line(line):
+            rows.append(line)
+            continue
+        text = line.strip().lstrip(';').strip()
+        is_title = text.lower().startswith("title:")
+        if is_title:
+            text = text[len("title:"):].strip()
+        if rows:
+            if is_title:
+                yield start, offset, text, rows
+                start = offset
+                text = ""
+            else:
+                yield start, line_start, title, rows
+                start = line_start
+            rows = []
+            title = None
+        if text:
+            title = text
+    if rows:
+        yield start, offset, title, rows
+
+
+def read_levels(path):
+    """Yield (title, grid) for every level of an XSB file, in file order.
+
+    Levels are runs of board rows; the title is the last text line before
+    the board (";" comments included) or a "Title:" line after it. The file
+    is read as the generator advances, one level at a time.
+    """
+    with open(path, 'rb') as f:
+        for _, _, title, rows in _scan(f):
+            yield title, to_grid(rows)
+
+
+class LevelCollection:
+    """
+    Random access to the levels of an XSB file by index.
+
+    The first len() or lookup scans the file once and keeps only the byte
+    range of each level; collection[i] then seeks to that range and parses
+    that level alone, so large collections are never held in memory.
+    Iterating reads the file lazily like read_levels.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._offsets = None  # (start, end) byte range of each level
+
+    @property
+    def offsets(self):
+        if self._offsets is None:
+            with open(self.path, 'rb') as f:
+                self._offsets = [(start, end) for start, end, _, _ in _scan(f)]
+        return self._offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        """(title, grid) of the level at index (negative indices count from the end)."""
+        start, end = self.offsets[index]
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+        for _, _, title, rows in _scan(io.BytesIO(data)):
+            return title, to_grid(rows)
+        raise IndexError(index)
+
+    def __iter__(self):
+        return read_levels(self.path)